@@ -1,14 +1,18 @@
-from machine import Pin
-from utime import sleep
+import hal
 
-pin = Pin(15, Pin.OUT)
+pin = hal.Pin(15)
 
-print("LED starts flashing...")
-while True:
-    try:
+def flash():
+    while True:
         pin.toggle()
-        sleep(1) # sleep 1sec
-    except KeyboardInterrupt:
-        break
+        yield 1000 # sleep 1sec
+
+print("LED starts flashing...")
+scheduler = hal.Scheduler()
+scheduler.add(flash(), "flash")
+try:
+    scheduler.run()
+except KeyboardInterrupt:
+    pass
 pin.off()
 print("Finished.")
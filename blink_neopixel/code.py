@@ -6,27 +6,30 @@
 Blink example for boards with ONLY a NeoPixel LED (e.g. without a built-in red LED).
 Includes QT Py and various Trinkeys.
 
-Requires two libraries from the Adafruit CircuitPython Library Bundle.
+Requires libraries from the Adafruit CircuitPython Library Bundle.
 Download the bundle from circuitpython.org/libraries and copy the
 following files to your CIRCUITPY/lib folder:
 * neopixel.mpy
 * adafruit_pixelbuf.mpy
+* asyncio/
+* adafruit_ticks.mpy
+
+Also copy circuitpython/lib/pixel_animation.py from this repository there.
 
 Once the libraries are copied, save this file as code.py to your CIRCUITPY
 drive to run it.
 """
-import time
+import asyncio
 import board
 import neopixel
+import pixel_animation
 
 pixels = neopixel.NeoPixel(board.NEOPIXEL, 1)
 
-while True:
-    pixels.fill((0, 0, 10))
-    time.sleep(0.1)
-    pixels.fill((10, 0, 0))
-    time.sleep(0.1)
-    pixels.fill((0, 10, 0))
-    time.sleep(0.1)
-    pixels.fill((0, 0, 0))
-    time.sleep(1.0)
+animator = pixel_animation.Animator()
+animator.add(pixels, (
+    ((0, 0, 10), 0.1),
+    ((10, 0, 0), 0.1),
+    ((0, 10, 0), 0.1),
+    ((0, 0, 0), 1.0)))
+asyncio.run(animator.run())
@@ -0,0 +1,139 @@
+# Compare lib/pin_map.py against the pin listing it replaced in
+# enumerate_pins_then_cycle_led_colors and asyncio_smoke_test_neopixel_rgb,
+# on mock board and microcontroller modules standing in for two boards. Both
+# must list the same pins. Reported are attribute lookups on the two modules,
+# which cost about the same on any machine, and time on this desktop.
+#
+#   python measure_pin_map.py
+#
+# Run from this directory.
+
+import os
+import sys
+import tempfile
+import time
+import types
+
+# Best of this many repeats is reported
+REPEAT = 20
+
+class Pin:
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return "microcontroller.pin.{0}".format(self._name)
+
+# Module stand-in counting attribute lookups
+class CountingModule(types.ModuleType):
+    lookups = 0
+
+    def __getattribute__(self, name):
+        if not name.startswith("__"):
+            CountingModule.lookups += 1
+        return super().__getattribute__(name)
+
+# Mock microcontroller with gpio_count pins, and board naming them by
+# aliases: list of (alias, GPIO number), plus a few attributes that aren't pins
+def install_board(board_id, gpio_count, aliases):
+    microcontroller = CountingModule("microcontroller")
+    microcontroller.Pin = Pin
+    microcontroller.pin = CountingModule("microcontroller.pin")
+    for number in range(gpio_count):
+        setattr(microcontroller.pin, "GPIO{0}".format(number), Pin("GPIO{0}".format(number)))
+
+    board = CountingModule("board")
+    board.board_id = board_id
+    for name in ("I2C", "SPI", "UART", "STEMMA_I2C"):
+        setattr(board, name, lambda: None)
+    for alias, number in aliases:
+        setattr(board, alias, getattr(microcontroller.pin, "GPIO{0}".format(number)))
+
+    sys.modules["microcontroller"] = microcontroller
+    sys.modules["board"] = board
+    return board, microcontroller
+
+def kb2040_aliases():
+    aliases = [("D{0}".format(number), number) for number in range(11)]
+    aliases += [("A0", 26), ("A1", 27), ("A2", 28), ("A3", 29), ("SCK", 18), ("MOSI", 19),
+        ("MISO", 20), ("SDA", 12), ("SCL", 13), ("TX", 0), ("RX", 1), ("NEOPIXEL", 17), ("BUTTON", 11)]
+    return aliases
+
+def esp32s3_aliases():
+    aliases = [("IO{0}".format(number), number) for number in range(49)]
+    aliases += [("D{0}".format(number), number) for number in range(22)]
+    aliases += [("A{0}".format(number), number + 1) for number in range(10)]
+    aliases += [("SCK", 36), ("MOSI", 35), ("MISO", 37), ("SDA", 3), ("SCL", 4), ("TX", 43),
+        ("RX", 44), ("NEOPIXEL", 48), ("BUTTON", 0), ("BOOT0", 0), ("LED", 13)]
+    return aliases
+
+BOARDS = (
+    ("kb2040", 30, kb2040_aliases()),
+    ("esp32s3_devkit", 49, esp32s3_aliases()),
+)
+
+# Pin listing as the two code.py files did it before pin_map
+def listing_before(board, microcontroller):
+    board_pins = []
+    for pin in dir(microcontroller.pin):
+        if isinstance(getattr(microcontroller.pin, pin), microcontroller.Pin):
+            pins = []
+            for alias in dir(board):
+                if getattr(board, alias) is getattr(microcontroller.pin, pin):
+                    pins.append(f"board.{alias}")
+            if pins:
+                pins.append(f"({str(pin)})")
+                board_pins.append(" ".join(pins))
+    return sorted(board_pins)
+
+def _import_pin_map():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import pin_map
+    return pin_map
+
+# Lookups and best desktop seconds of function(), and its result
+def _measure(function):
+    best = None
+    for _ in range(REPEAT):
+        CountingModule.lookups = 0
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return CountingModule.lookups, best, result
+
+def main():
+    print("{0:<16} {1:<18} {2:>8} {3:>10}".format("board", "", "lookups", "desktop us"))
+    table_directory = tempfile.mkdtemp()
+    for board_id, gpio_count, aliases in BOARDS:
+        board, microcontroller = install_board(board_id, gpio_count, aliases)
+        pin_map = _import_pin_map()
+        pin_map.board = board
+        pin_map.microcontroller = microcontroller
+        table = os.path.join(table_directory, board_id + ".txt")
+        pin_map._pins = None
+        pin_map.save(table)
+
+        def build():
+            pin_map._pins = None
+            pin_map.load()
+            return sorted(pin_map.board_pins())
+
+        def load_table():
+            pin_map._pins = None
+            pin_map.load(table)
+            return sorted(pin_map.board_pins())
+
+        results = []
+        for label, function in (("before", lambda: listing_before(board, microcontroller)),
+                ("pin_map", build), ("pin_map table", load_table)):
+            lookups, seconds, result = _measure(function)
+            results.append(result)
+            print("{0:<16} {1:<18} {2:>8} {3:>10.1f}".format(board_id, label, lookups, seconds * 1e6))
+        assert results[0] == results[1] == results[2], "pin_map lists different pins"
+        assert "NEOPIXEL" in pin_map.gpio_aliases(pin_map.gpio_name(pin_map.alias_pin("NEOPIXEL")))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
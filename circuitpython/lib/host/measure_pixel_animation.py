@@ -0,0 +1,102 @@
+# Compare lib/pixel_animation.py against one asyncio task per animation
+# setting pixels and sleeping between steps, the way the NeoPixel examples
+# did it before. Runs in virtual time with mx340_interface's host stand-ins
+# (see ../../mx340_interface/host), so scheduler passes cost the same as
+# there and results don't depend on the speed of this desktop.
+#
+#   python measure_pixel_animation.py
+#
+# Run from this directory.
+
+import asyncio
+import os
+import sys
+
+HOST_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HOST_DIRECTORY, "..", "..", "mx340_interface", "host"))
+sys.path.insert(0, os.path.dirname(HOST_DIRECTORY))
+
+import mx340 # Puts CircuitPython stand-ins on sys.path
+import virtual_time
+import pixel_animation
+
+# Seconds of animation measured
+DURATION = 10.0
+
+# NeoPixel strip stand-in counting writes to the LEDs
+class Strip:
+    def __init__(self, length, auto_write=True):
+        self.length = length
+        self.auto_write = auto_write
+        self.shows = 0
+        self._pixels = [(0, 0, 0)] * length
+
+    def __setitem__(self, index, colour):
+        self._pixels[index] = colour
+        if self.auto_write:
+            self.show()
+
+    def fill(self, colour):
+        self._pixels = [colour] * self.length
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        self.shows += 1
+
+# Status animations of different rhythms, one per pixel
+def keyframes(number):
+    on = 0.05 + 0.01 * (number % 7)
+    colour = ((number * 37) % 32, (number * 11) % 32, (number * 5) % 32)
+    return ((colour, on), ((0, 0, 0), on), (colour, on), ((0, 0, 0), 0.5 + 0.1 * (number % 5)))
+
+# One task per animation, as blink_rgb() was written
+async def _per_task(strips, count):
+    loop = asyncio.get_running_loop()
+    late = []
+    async def blink(strip, index, frames):
+        due = loop.time()
+        while True:
+            for colour, seconds in frames:
+                late.append(loop.time() - due)
+                strip[index] = colour
+                due += seconds
+                await asyncio.sleep(seconds)
+    return [asyncio.create_task(blink(strips[number % len(strips)], number // len(strips), keyframes(number)))
+        for number in range(count)], lambda: (len(late), sum(late) * 1000, max(late) * 1000)
+
+async def _animator(strips, count):
+    animator = pixel_animation.Animator()
+    for number in range(count):
+        animator.add(strips[number % len(strips)], keyframes(number), number // len(strips))
+    def stats():
+        changes, _, late_total, late_max = animator.get_drift_stats()
+        return changes, late_total, late_max
+    return [asyncio.create_task(animator.run())], stats
+
+async def _measure(start, count, strip_count):
+    loop = asyncio.get_running_loop()
+    strips = [Strip(count // strip_count + 1) for _ in range(strip_count)]
+    tasks, stats = await start(strips, count)
+    iterations = loop.iterations
+    idle_time = loop.idle_time
+    began = loop.time()
+    await asyncio.sleep(DURATION)
+    elapsed = loop.time() - began
+    for task in tasks:
+        task.cancel()
+    changes, late_total, late_max = stats()
+    return ((loop.iterations - iterations) / elapsed, 1 - (loop.idle_time - idle_time) / elapsed,
+        sum(strip.shows for strip in strips) / elapsed, changes, late_total / changes, late_max)
+
+def main():
+    print("{0:<28} {1:>10} {2:>7} {3:>8} {4:>10} {5:>12} {6:>12}".format("", "passes/s", "busy", "shows/s", "keyframes", "mean late ms", "max late ms"))
+    for count, strip_count in ((1, 1), (8, 1), (32, 1), (32, 4)):
+        for label, start in (("tasks", _per_task), ("Animator", _animator)):
+            passes, busy, shows, changes, late_mean, late_max = virtual_time.run(_measure(start, count, strip_count))
+            name = "{0} on {1} strip{2}, {3}".format(count, strip_count, "s" if strip_count > 1 else "", label)
+            print("{0:<28} {1:>10.0f} {2:>7.1%} {3:>8.1f} {4:>10} {5:>12.2f} {6:>12.2f}".format(name, passes, busy, shows, changes, late_mean, late_max))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+# Input event bus merging mx340_interface K13988 key matrix events with
+# direct-wired button events from a keypad.Keys, for consumers to await rather
+# than poll. panel is a K13988 or K13988_Panels. Its receiver task signals new
+# key events. Only keys is checked every poll_interval, and only while a
+# consumer waits for direct-wired events. Use as an asynchronous context
+# manager:
+#
+#   async with InputEvents(k13988, keys, direct_wired_poll_interval) as inputs:
+#       event = await inputs.next_key_event(source=KeyEvent.DIRECT)
+#
+# Copy to lib/ on the CIRCUITPY drive.
+
+import asyncio
+
+from keypad import Event
+from key_event import KeyEvent
+
+class InputEvents:
+    # poll_interval is seconds between checks of keys while a consumer waits
+    # for direct-wired events, as direct_wired_poll_interval in code.py
+    def __init__(self, panel, keys, poll_interval):
+        self._panel = panel
+        self._keys = keys
+        self._key = Event()
+        self._poll_interval = poll_interval
+        # Shared with panel receiver, set by either source. Consumers check
+        # their own source before clearing it, so none misses a wakeup.
+        self._available = panel.get_key_event_available()
+        self._direct_waiting = 0
+        self._direct_wanted = asyncio.Event()
+
+    # Fill in KeyEvent with next event from source (KeyEvent.PANEL or
+    # KeyEvent.DIRECT), or from either if None, panel first. Returns False if
+    # there is none.
+    def get_key_event_into(self, event, source=None):
+        if source != KeyEvent.DIRECT and self._panel.get_key_event_into(event):
+            event.source = KeyEvent.PANEL
+            return True
+        if source != KeyEvent.PANEL and self._keys.events.get_into(self._key):
+            event.key_number = self._key.key_number
+            event.pressed = self._key.pressed
+            event.released = not event.pressed
+            event.panel = 0
+            event.source = KeyEvent.DIRECT
+            return True
+        return False
+
+    # Wait for next event from source as in get_key_event_into(). Fills in and
+    # returns a KeyEvent if given one, otherwise returns a new one.
+    async def next_key_event(self, event=None, source=None):
+        if event is None:
+            event = KeyEvent()
+        direct = source != KeyEvent.PANEL
+        if direct:
+            self._direct_waiting += 1
+            self._direct_wanted.set()
+        try:
+            while not self.get_key_event_into(event, source):
+                self._available.clear()
+                await self._available.wait()
+        finally:
+            if direct:
+                self._direct_waiting -= 1
+        return event
+
+    # Task checking keypad.Keys for events while a consumer waits for them
+    async def _direct_poller(self):
+        events = self._keys.events
+        while True:
+            if not self._direct_waiting:
+                self._direct_wanted.clear()
+                await self._direct_wanted.wait()
+            await asyncio.sleep(self._poll_interval)
+            if events:
+                self._available.set()
+
+    async def __aenter__(self):
+        self.poller_task = asyncio.create_task(self._direct_poller())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.poller_task.cancel()
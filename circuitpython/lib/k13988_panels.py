@@ -0,0 +1,97 @@
+# Several mx340_interface K13988 control panels, each on its own UART, run
+# together. A single receiver task reads every panel's UART, and key events
+# from all of them can be read in one place. Use as an asynchronous context
+# manager like K13988:
+#
+#   async with K13988_Panels(K13988, panel_pins, uart_rx_poll_interval) as panels:
+#       for k13988 in panels.panels:
+#           ...
+#
+# Copy to lib/ on the CIRCUITPY drive.
+
+import asyncio
+
+from key_event import KeyEvent
+
+class K13988_Panels:
+    # panel_class is K13988, made for each (tx_pin, rx_pin, enable_pin) in pins
+    # with the receiver wakeup and key event signals shared by all panels.
+    # rx_poll_interval is seconds between UART checks while no ACK is
+    # expected, as uart_rx_poll_interval in code.py.
+    def __init__(self, panel_class, pins, rx_poll_interval):
+        self._rx_expecting_ack = asyncio.Event()
+        self._key_event_available = asyncio.Event()
+        self._rx_poll_interval = rx_poll_interval
+        self.panels = [panel_class(tx_pin, rx_pin, enable_pin, self._rx_expecting_ack, self._key_event_available)
+            for tx_pin, rx_pin, enable_pin in pins]
+        # Panel to check first, rotated so no panel is always served first
+        self._rx_panel = 0
+        self._key_panel = 0
+
+    # Receive task reading every panel's UART
+    async def _uart_receiver(self):
+        panels = self.panels
+        while True:
+            received = False
+            expecting_ack = False
+            for count in range(len(panels)):
+                panel = panels[(self._rx_panel + count) % len(panels)]
+                if panel.uart_receive():
+                    received = True
+                if panel.get_commands_in_flight():
+                    expecting_ack = True
+            self._rx_panel = (self._rx_panel + 1) % len(panels)
+            if received:
+                continue
+            if expecting_ack or self._rx_poll_interval == 0:
+                await asyncio.sleep(0)
+            else:
+                self._rx_expecting_ack.clear()
+                try:
+                    await asyncio.wait_for(self._rx_expecting_ack.wait(), self._rx_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    # Fill in KeyEvent with next key event from any panel, setting its panel
+    # attribute to the index of the panel in panels. Returns False if there is none.
+    def get_key_event_into(self, event):
+        panels = self.panels
+        for count in range(len(panels)):
+            index = (self._key_panel + count) % len(panels)
+            if panels[index].get_key_event_into(event):
+                event.panel = index
+                self._key_panel = (index + 1) % len(panels)
+                return True
+        return False
+
+    # Wait for next key event from any panel. Fills in and returns a KeyEvent
+    # if given one, otherwise returns a new one. Its panel attribute is the
+    # index of the panel in panels.
+    async def next_key_event(self, event=None):
+        if event is None:
+            event = KeyEvent()
+        while not self.get_key_event_into(event):
+            self._key_event_available.clear()
+            await self._key_event_available.wait()
+        return event
+
+    # Event set whenever a key event arrives from any panel
+    def get_key_event_available(self):
+        return self._key_event_available
+
+    # Refresh every panel's screen at the same time
+    async def refresh(self):
+        await asyncio.gather(*(panel.refresh() for panel in self.panels))
+
+    # Asynchronous context manager entry to set up communications with every
+    # panel, initializing them at the same time
+    async def __aenter__(self):
+        self.receiver_task = asyncio.create_task(self._uart_receiver())
+        await asyncio.gather(*(panel.__aenter__() for panel in self.panels))
+        return self
+
+    # Asynchronous context manager exit to clean up communications with every panel
+    async def __aexit__(self, exc_type, exc, tb):
+        for panel in self.panels:
+            await panel.__aexit__(exc_type, exc, tb)
+        self.receiver_task.cancel()
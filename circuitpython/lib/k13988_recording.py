@@ -0,0 +1,155 @@
+# Recording of frames sent by mx340_interface's K13988.refresh(), for
+# regression tests and demos:
+#
+#   k13988.set_recorder(FrameRecorder(stream))
+#
+# Format: magic b'K13R' and version byte 1, then per frame a little-endian
+# uint16 of milliseconds since previous frame (0 for the first), a byte with
+# bit n set if stripe n changed, and for each changed stripe its XOR with the
+# previous frame, run-length encoded: control byte c < 0x80 is c+1 unchanged
+# bytes, c >= 0x80 is followed by c-0x7F bytes to XOR in. The frame before
+# the first is all zeros.
+#
+# To record on the device, CIRCUITPY must first be made writable by boot.py
+# (storage.remount("/", False)).
+#
+# Copy to lib/ on the CIRCUITPY drive.
+
+import asyncio
+import struct
+import supervisor
+
+# supervisor.ticks_ms() wraps around to 0 at this value
+_ticks_period = 1 << 29
+
+# Milliseconds from ticks_ms() value start to later value end
+def _ticks_diff(end, start):
+    return (end - start) % _ticks_period
+
+class FrameRecorder:
+    MAGIC = b'K13R\x01'
+
+    # stream is a file opened for binary writing, frames are written as added
+    def __init__(self, stream):
+        self._stream = stream
+        self._previous = bytearray(196*5)
+        self._previous_memoryview = memoryview(self._previous)
+        # Worst case encoding of a stripe is a control byte per 2 data bytes
+        self._delta = bytearray(196 + 98 + 1)
+        self._delta_memoryview = memoryview(self._delta)
+        self._header = bytearray(3)
+        self._last_time = None
+        self.frames = 0
+        self.bytes_written = len(self.MAGIC)
+        stream.write(self.MAGIC)
+
+    # Append frame, a memoryview of 196*5 frame buffer bytes
+    def add_frame(self, frame):
+        now = supervisor.ticks_ms()
+        delay = 0
+        if self._last_time is not None:
+            delay = min(_ticks_diff(now, self._last_time), 0xFFFF)
+        self._last_time = now
+
+        previous = self._previous_memoryview
+        mask = 0
+        for stripe in range(5):
+            if frame[stripe*196:stripe*196+196] != previous[stripe*196:stripe*196+196]:
+                mask |= 1 << stripe
+        struct.pack_into('<HB', self._header, 0, delay, mask)
+        self._stream.write(self._header)
+        self.bytes_written += 3
+
+        for stripe in range(5):
+            if mask & (1 << stripe):
+                length = self._encode_stripe(frame, stripe*196)
+                self._stream.write(self._delta_memoryview[:length])
+                self.bytes_written += length
+        previous[:] = frame
+        self.frames += 1
+
+    # Run-length encode XOR of stripe starting at index with previous frame
+    # into _delta, returns length. Two unchanged bytes end a literal run.
+    def _encode_stripe(self, frame, index):
+        previous = self._previous
+        delta = self._delta
+        end = index + 196
+        length = 0
+        while index < end:
+            run = 0
+            while index + run < end and run < 128 and frame[index + run] == previous[index + run]:
+                run += 1
+            if run:
+                delta[length] = run - 1
+                length += 1
+                index += run
+                continue
+            literal = 0
+            while index + literal < end and literal < 128:
+                if frame[index + literal] == previous[index + literal]:
+                    if index + literal + 1 >= end or frame[index + literal + 1] == previous[index + literal + 1]:
+                        break
+                literal += 1
+            delta[length] = 0x7F + literal
+            for offset in range(literal):
+                delta[length + 1 + offset] = frame[index + offset] ^ previous[index + offset]
+            length += 1 + literal
+            index += literal
+        return length
+
+# Reads frames written by FrameRecorder
+class FrameReader:
+    # stream is a file opened for binary reading
+    def __init__(self, stream):
+        self._stream = stream
+        if stream.read(len(FrameRecorder.MAGIC)) != FrameRecorder.MAGIC:
+            raise ValueError("Not a K13988 frame recording")
+        # Content of the most recently read frame
+        self.frame = bytearray(196*5)
+
+    # Read next frame into frame, returns milliseconds since previous frame,
+    # or None at end of recording
+    def read_frame(self):
+        header = self._stream.read(3)
+        if not header or len(header) < 3:
+            return None
+        delay, mask = struct.unpack('<HB', header)
+        frame = self.frame
+        for stripe in range(5):
+            if not mask & (1 << stripe):
+                continue
+            index = stripe*196
+            end = index + 196
+            while index < end:
+                control = self._stream.read(1)[0]
+                if control < 0x80:
+                    index += control + 1
+                else:
+                    data = self._stream.read(control - 0x7F)
+                    for value in data:
+                        frame[index] ^= value
+                        index += 1
+        return delay
+
+# Play recording from stream on K13988. speed scales original timing
+# (2 is twice as fast), 0 plays as fast as the panel accepts frames.
+# Returns number of frames played.
+async def play_recording(k13988, stream, speed=1.0):
+    reader = FrameReader(stream)
+    framebuffer = k13988.get_frame_buffer_bytearray()
+    frames = 0
+    elapsed = 0
+    start = supervisor.ticks_ms()
+    while True:
+        delay = reader.read_frame()
+        if delay is None:
+            return frames
+        if speed:
+            # Keep to recorded timing overall, even if a refresh ran long
+            elapsed += delay / speed
+            wait = elapsed - _ticks_diff(supervisor.ticks_ms(), start)
+            if wait > 0:
+                await asyncio.sleep(wait / 1000)
+        framebuffer[:] = reader.frame
+        await k13988.refresh()
+        frames += 1
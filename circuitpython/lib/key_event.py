@@ -0,0 +1,19 @@
+# Key event shared by mx340_interface's K13988 and the lib modules reading key
+# events from it (k13988_panels, input_events).
+#
+# Copy to lib/ on the CIRCUITPY drive.
+
+# Key event filled in by K13988.next_key_event(), with the same attributes as
+# keypad.Event. Unlike keypad.Event one can be reused for every key event.
+class KeyEvent:
+    # Where an event came from, set by InputEvents
+    PANEL       = 0 # K13988 key matrix, key_number is a scan code
+    DIRECT      = 1 # Direct-wired button, key_number is its keypad.Keys number
+
+    def __init__(self, key_number=0, pressed=True):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.released = not pressed
+        # Index of panel the event came from, set by K13988_Panels
+        self.panel = 0
+        self.source = KeyEvent.PANEL
@@ -0,0 +1,108 @@
+# Index of the pins a CircuitPython board names: for every microcontroller.pin
+# Pin used by board, its GPIO name and its board aliases. Built with one pass
+# over dir(board) and one over dir(microcontroller.pin), with pins looked up
+# by identity, instead of comparing every alias against every pin. Built on
+# first use and kept, or read from a table saved by save() for this board.
+#
+# Copy to lib/ on the CIRCUITPY drive.
+
+import board
+import microcontroller
+
+# Pin -> [GPIO name, list of board alias names]
+_pins = None
+# Board alias name -> Pin
+_aliases = None
+
+def _build():
+    global _pins, _aliases
+    pins = {}
+    aliases = {}
+    for alias in dir(board):
+        pin = getattr(board, alias)
+        if isinstance(pin, microcontroller.Pin):
+            aliases[alias] = pin
+            if pin in pins:
+                pins[pin][1].append(alias)
+            else:
+                pins[pin] = [None, [alias]]
+    for name in dir(microcontroller.pin):
+        pin = getattr(microcontroller.pin, name)
+        if pin in pins:
+            pins[pin][0] = name
+    _pins = pins
+    _aliases = aliases
+
+# Read table written by save(). Returns False if it is for another board or
+# names a pin this firmware doesn't have.
+def _read(path):
+    global _pins, _aliases
+    pins = {}
+    aliases = {}
+    with open(path) as table:
+        if table.readline().strip() != board.board_id:
+            return False
+        for line in table:
+            names = line.split()
+            if not names:
+                continue
+            pin = getattr(microcontroller.pin, names[0], None)
+            if pin is None:
+                return False
+            pins[pin] = [names[0], names[1:]]
+            for alias in names[1:]:
+                aliases[alias] = pin
+    _pins = pins
+    _aliases = aliases
+    return True
+
+# Build index now, from table at path if given and it matches this board.
+# Lookups call this without a path if it hasn't been done already.
+def load(path=None):
+    if _pins is not None:
+        return
+    if path is not None:
+        try:
+            if _read(path):
+                return
+        except OSError:
+            pass
+    _build()
+
+# Write index as a table for load() to read on later boots: board_id, then
+# one line per pin of GPIO name followed by its aliases. CIRCUITPY must be
+# writable by code (storage.remount("/", False) in boot.py), otherwise this
+# raises OSError.
+def save(path):
+    load()
+    with open(path, "w") as table:
+        table.write(board.board_id + "\n")
+        for name, aliases in _pins.values():
+            if name is not None:
+                table.write(" ".join([name] + aliases) + "\n")
+
+# GPIO name (e.g. "GPIO16") of a Pin, None if microcontroller.pin doesn't name it
+def gpio_name(pin):
+    load()
+    return _pins[pin][0]
+
+# List of board alias names (e.g. ["D4", "SDA"]) of a Pin
+def aliases(pin):
+    load()
+    return _pins[pin][1]
+
+# Pin of a board alias name
+def alias_pin(alias):
+    load()
+    return _aliases[alias]
+
+# List of board alias names of a GPIO name
+def gpio_aliases(name):
+    return aliases(getattr(microcontroller.pin, name))
+
+# One line per pin with both names, like "board.D4 board.SDA (GPIO16)", in
+# no particular order
+def board_pins():
+    load()
+    return [" ".join(["board." + alias for alias in aliases] + ["({0})".format(name)])
+        for name, aliases in _pins.values() if name is not None]
@@ -0,0 +1,148 @@
+# Keyframe animation of NeoPixels (or any adafruit_pixelbuf strip) in a single
+# asyncio task. Each animation is a sequence of (colour, seconds) keyframes
+# for one pixel or a whole strip. The task sleeps until the next keyframe is
+# due, sets every pixel due then, and calls show() once per strip changed.
+# Strips are switched to auto_write = False so setting pixels doesn't write
+# them out one by one.
+#
+# Keyframes are scheduled from when the previous one was due rather than when
+# it was shown, so lateness doesn't add up over repeats. get_drift_stats()
+# says how late they were shown.
+#
+# Copy to lib/ on the CIRCUITPY drive.
+
+import asyncio
+import supervisor
+
+# Waits longer than this many seconds are cut short by Animator.add(), so an
+# animation added meanwhile starts on time. Shorter ones are plain sleeps,
+# which take fewer scheduler passes; an animation added during one starts
+# when it ends.
+interruptible_delay = 0.1
+
+# supervisor.ticks_ms() wraps around to 0 at this value
+_ticks_period = 1 << 29
+
+# Milliseconds from ticks_ms() value start to later value end. Negative if
+# end is before start, for differences under half the period.
+def _ticks_diff(end, start):
+    diff = (end - start) % _ticks_period
+    if diff >= _ticks_period // 2:
+        diff -= _ticks_period
+    return diff
+
+# One keyframe sequence, created by Animator.add()
+class Animation:
+    def __init__(self, pixels, keyframes, index, repeat):
+        self.pixels = pixels
+        self.index = index
+        self.repeat = repeat
+        self._colours = [colour for colour, _ in keyframes]
+        self._durations = [int(seconds * 1000) for _, seconds in keyframes]
+        # Keyframe to show next, and ticks_ms when it is due
+        self._next = 0
+        self._due = 0
+
+    # Set pixel (or whole strip) to colour of next keyframe and schedule the
+    # one after. Returns False once a non-repeating animation is done.
+    def _step(self):
+        colour = self._colours[self._next]
+        if self.index is None:
+            self.pixels.fill(colour)
+        else:
+            self.pixels[self.index] = colour
+        self._due = (self._due + self._durations[self._next]) % _ticks_period
+        self._next += 1
+        if self._next == len(self._colours):
+            if not self.repeat:
+                return False
+            self._next = 0
+        return True
+
+class Animator:
+    def __init__(self):
+        self._animations = []
+        self._wakeup = asyncio.Event()
+        # Keyframes shown, show() calls, total and worst milliseconds late
+        self._changes = 0
+        self._shows = 0
+        self._late_total = 0
+        self._late_max = 0
+
+    # Start animating pixel index of pixels, or every pixel if index is None,
+    # through keyframes: a sequence of (colour, seconds to hold it). Unless
+    # repeat is False the sequence starts over after the last keyframe,
+    # otherwise its colour stays. A repeating sequence must last at least a
+    # millisecond in total. Returns Animation for remove().
+    def add(self, pixels, keyframes, index=None, repeat=True):
+        if not keyframes:
+            raise ValueError("Animation needs at least one keyframe")
+        animation = Animation(pixels, keyframes, index, repeat)
+        if repeat and not sum(animation._durations):
+            # Would be due again at once, forever
+            raise ValueError("Repeating animation must last at least 1ms")
+        pixels.auto_write = False
+        animation._due = supervisor.ticks_ms()
+        self._animations.append(animation)
+        self._wakeup.set()
+        return animation
+
+    # Stop animation, leaving its pixels as they are
+    def remove(self, animation):
+        if animation in self._animations:
+            self._animations.remove(animation)
+
+    # Get timing statistics as a tuple of (keyframes shown, show() calls,
+    # total milliseconds keyframes were shown late, worst milliseconds late)
+    def get_drift_stats(self):
+        return (self._changes, self._shows, self._late_total, self._late_max)
+
+    # Animation task
+    async def run(self):
+        # Whether keyframes were shown without awaiting since
+        stepped = False
+        while True:
+            if not self._animations:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                stepped = False
+                continue
+
+            now = supervisor.ticks_ms()
+            delay = min(_ticks_diff(animation._due, now) for animation in self._animations)
+            if delay > interruptible_delay * 1000:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay / 1000)
+                except asyncio.TimeoutError:
+                    pass
+                stepped = False
+                continue
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+                stepped = False
+                continue
+            if stepped:
+                # More keyframes due already, let other tasks run first
+                await asyncio.sleep(0)
+                stepped = False
+                continue
+
+            # Every keyframe due by now, then one show() per strip
+            strips = []
+            for animation in list(self._animations):
+                late = _ticks_diff(now, animation._due)
+                if late < 0:
+                    continue
+                self._changes += 1
+                self._late_total += late
+                if late > self._late_max:
+                    self._late_max = late
+                if not animation._step():
+                    self._animations.remove(animation)
+                if animation.pixels not in strips:
+                    strips.append(animation.pixels)
+            for pixels in strips:
+                pixels.show()
+            self._shows += len(strips)
+            stepped = True
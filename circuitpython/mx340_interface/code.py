@@ -1,25 +1,133 @@
 import board
+import microcontroller
+import supervisor
 import asyncio
 import digitalio
 import busio
+import array
+import struct
 
 # Parent class of optional LCD screen FrameBuffer wrapper
 import adafruit_framebuf
 
-# Support keyboard event queue
-from collections import deque
+# Key events returned by get_key_event()
 from keypad import Event
+from key_event import KeyEvent
 
-# Direct-wired buttons
+# Direct-wired buttons, merged with K13988 key events
 from keypad import Keys
+from input_events import InputEvents
 
 # Maximum number of UART transmission retries, raises RuntimeError when exceeded
 uart_tx_retry_limit = 16
 
-# Maximum length of keyboard event queue. Any additional events
-# are discarded when the queue is full.
+# Seconds to wait for ACK before resending everything not yet acknowledged
+uart_tx_ack_timeout = 0.02
+
+# Maximum number of commands sent to K13988 together before waiting for their
+# ACKs. An ACK doesn't say which command it is for, so if any are missing the
+# whole group is sent again. Set to 1 for stop-and-wait. Bulk LCD transfer
+# header and data are always sent on their own, so a lost or repeated command
+# can't shift pixels into commands or commands into pixels.
+uart_tx_window = 4
+
+# Maximum number of commands waiting in transmit queue. Senders wait for room.
+uart_tx_queue_length = 32
+
+# Maximum number of control commands (LED state) waiting in transmit queue.
+# They are sent ahead of LCD updates already queued.
+uart_tx_control_queue_length = 8
+
+# busio.UART can't notify when data arrives, so the receiver checks for it.
+# While ACKs are awaited it checks on every pass of the scheduler, otherwise
+# it checks this often (seconds) or as soon as a command is sent. Set to 0 to
+# always check on every pass.
+uart_rx_poll_interval = 0.005
+
+# Maximum length of keyboard event queue. When it is full, key presses are
+# discarded along with their release. A release is never discarded on its own.
 key_event_queue_length = 64
 
+# Send only the changed columns of an LCD stripe instead of all 196. This
+# relies on the column address commands decoded in _lcd_column_offset, which
+# have only been checked against the simulator, not a real MX340 panel. If the
+# LCD controller ignores or misreads them, K13988 still ACKs and the screen is
+# silently wrong, so this is off until confirmed on hardware. When on, it is
+# switched off automatically if K13988 stops acknowledging a partial write.
+lcd_partial_stripe_update = False
+
+# Maximum number of pre-rendered glyphs (per character, size and vertical
+# offset within a stripe) kept by K13988_FrameBuffer. Least recently used
+# glyphs are discarded to stay within this limit.
+glyph_cache_size = 64
+
+# Minimum seconds between screen refreshes sent by K13988's display task after
+# mark_dirty(). Drawing done in between goes out together in the next one, so
+# a burst of changes sends only the latest frame instead of queuing stale ones.
+display_refresh_interval = 0.02
+
+# After a display task refresh fails, it waits twice as long as before the
+# last attempt (starting from display_refresh_interval) before trying again,
+# up to this many seconds, so a disconnected panel isn't retried back to back.
+display_retry_max_interval = 2.0
+
+# Number of most recent display task refreshes whose latency (from first
+# mark_dirty() to refresh complete) is kept for get_display_stats()
+display_latency_samples = 64
+
+# Direct-wired buttons, keypad.Keys key numbers 0 and 1 ("On" and "Stop")
+direct_wired_key_pins = (board.GP5, board.GP6)
+
+# keypad.Keys can't notify asyncio of new events, so InputEvents
+# (lib/input_events.py) checks its event queue this often (seconds) while
+# something waits for one
+direct_wired_poll_interval = 0.01
+
+# Font and size of key name labels drawn by printkeys()
+key_label_font = "lib/font5x8.bin"
+key_label_size = 2
+
+# Pre-render every key name label so a key press copies bytes into the frame
+# buffer instead of drawing text. Labels are loaded from key_label_file if
+# present (see host/make_key_labels.py), otherwise rendered at startup.
+key_label_precompute = True
+key_label_file = "lib/key_labels.bin"
+
+# supervisor.ticks_ms() wraps around to 0 at this value
+_ticks_period = 1 << 29
+
+# Milliseconds from ticks_ms() value start to later value end
+def _ticks_diff(end, start):
+    return (end - start) % _ticks_period
+
+# K13988 UART TX, RX and enable pins, one tuple per control panel. With more
+# than one, main() runs them all together with K13988_Panels
+# (lib/k13988_panels.py).
+panel_pins = [(board.GP0, board.GP1, board.GP2)]
+
+# Number of most recent events kept by K13988 tracing (see print_trace()). 0
+# turns tracing and ACK/refresh histograms off, leaving a single attribute
+# check at each place an event would be recorded.
+trace_length = 0
+
+# Add value to histogram array. Bucket 0 counts zeros, bucket n counts values
+# from 2**(n-1) up to 2**n, last bucket also counts anything larger.
+def _histogram_add(histogram, value):
+    bucket = 0
+    while value and bucket < len(histogram) - 1:
+        value >>= 1
+        bucket += 1
+    histogram[bucket] += 1
+
+# Reverse bit order of a byte, for LCD controller commands that K13988 expects
+# least-significant bit first.
+def _bit_reverse(value):
+    result = 0
+    for _ in range(8):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
 # Constants for all key scan codes.
 # https://newscrewdriver.com/2024/01/14/canon-pixma-mx340-control-panel-button-press-report-values/
 # Code format follows Adafruit HID Key codes:
@@ -91,6 +199,17 @@ keycode_string = dict({
     Keycode.COLOR:      "Color"
 })
 
+# Key scan codes reported by K13988 run from Keycode.NONE (0x80) to 0xCC
+keycode_first = 0x80
+keycode_count = 0xCC - 0x80 + 1
+
+# Dense table of key names indexed by scan code - keycode_first, so looking
+# up a name allocates nothing. Codes without a name get their hex value.
+keycode_names = [keycode_string.get(code, "0x{0:X}".format(code)) for code in range(keycode_first, keycode_first + keycode_count)]
+
+# 1 for each scan code in keycode_names that is a known key
+keycode_known = bytearray(code in keycode_string for code in range(keycode_first, keycode_first + keycode_count))
+
 # Copied MVLSBFormat from
 # https://github.com/adafruit/Adafruit_CircuitPython_framebuf/blob/main/adafruit_framebuf.py
 # Then modified from least-significant bit nearest top of screen to most-significant-bit up top
@@ -118,29 +237,57 @@ class MVMSBFormat:
     def fill(framebuf, color):
         """completely fill/clear the buffer with a color"""
         if color:
-            fill = 0xFF
+            framebuf.buf[:] = b'\xFF' * len(framebuf.buf)
         else:
-            fill = 0x00
-        for i in range(len(framebuf.buf)):  # pylint: disable=consider-using-enumerate
-            framebuf.buf[i] = fill
+            framebuf.buf[:] = bytes(len(framebuf.buf))
 
     @staticmethod
     def fill_rect(framebuf, x, y, width, height, color):
         """Draw a rectangle at the given location, size and color. The ``fill_rect`` method draws
         both the outline and interior."""
         # pylint: disable=too-many-arguments
-        while height > 0:
+        # Work through each band of 8 rows stored in one row of bytes, so every
+        # byte is written once: whole bytes where all 8 rows are covered, bits
+        # under a mask otherwise.
+        buf = framebuf.buf
+        y_end = y + height
+        while y < y_end:
+            band_top = y & ~0x07
+            band_end = min(band_top + 8, y_end)
+            mask = (0xFF >> (y - band_top)) & (0xFF << (band_top + 8 - band_end)) & 0xFF
             index = (y >> 3) * framebuf.stride + x
-            offset = y & 0x07
-            for w_w in range(width):
-                pixel_byte = 0x00
-                if color != 0:
-                    pixel_byte = 0x80 >> offset
-                framebuf.buf[index + w_w] = (
-                    framebuf.buf[index + w_w] & ~(0x80 >> offset)
-                ) | pixel_byte
-            y += 1
-            height -= 1
+            if mask == 0xFF:
+                if color:
+                    buf[index:index + width] = b'\xFF' * width
+                else:
+                    buf[index:index + width] = bytes(width)
+            elif color:
+                for i in range(index, index + width):
+                    buf[i] |= mask
+            else:
+                mask = ~mask
+                for i in range(index, index + width):
+                    buf[i] &= mask
+            y = band_end
+
+    @staticmethod
+    def hline(framebuf, x, y, width, color):
+        """Draw a horizontal line, one bit in each of a row of bytes."""
+        buf = framebuf.buf
+        index = (y >> 3) * framebuf.stride + x
+        if color:
+            mask = 0x80 >> (y & 0x07)
+            for i in range(index, index + width):
+                buf[i] |= mask
+        else:
+            mask = ~(0x80 >> (y & 0x07))
+            for i in range(index, index + width):
+                buf[i] &= mask
+
+    @staticmethod
+    def vline(framebuf, x, y, height, color):
+        """Draw a vertical line, one byte per band of 8 rows."""
+        MVMSBFormat.fill_rect(framebuf, x, y, 1, height, color)
 
 # FrameBuffer class for drawing on the byte array
 class K13988_FrameBuffer(adafruit_framebuf.FrameBuffer):
@@ -150,10 +297,251 @@ class K13988_FrameBuffer(adafruit_framebuf.FrameBuffer):
         # Change format over to our custom format.
         self.format = MVMSBFormat()
 
+        # Font file content and glyphs pre-rendered into MVMSB column bytes
+        self._glyph_font_name = None
+        self._glyph_font = None
+        self._glyph_cache = dict()
+        self._glyph_cache_order = []
+
+    # Parent class draws lines as 1-pixel-wide rectangles, use the format's
+    # line drawing instead. Rotated lines are left to the parent class.
+    def hline(self, x, y, width, color):
+        if self.rotation:
+            return super().hline(x, y, width, color)
+        if y < 0 or y >= self.height or x >= self.width or x + width <= 0:
+            return
+        x_end = min(self.width, x + width)
+        x = max(x, 0)
+        self.format.hline(self, x, y, x_end - x, color)
+
+    def vline(self, x, y, height, color):
+        if self.rotation:
+            return super().vline(x, y, height, color)
+        if x < 0 or x >= self.width or y >= self.height or y + height <= 0:
+            return
+        y_end = min(self.height, y + height)
+        y = max(y, 0)
+        self.format.vline(self, x, y, y_end - y, color)
+
+    # Same result as parent class text(), but each glyph is drawn by copying
+    # pre-rendered column bytes instead of one scaled pixel at a time. Rotated
+    # text, and sizes below 1 that the parent spaces oddly, are left to it.
+    def text(self, string, x, y, color, *, font_name="font5x8.bin", size=1):
+        # pylint: disable=too-many-arguments
+        if self.rotation or size < 1:
+            return super().text(string, x, y, color, font_name=font_name, size=size)
+        if self._glyph_font_name != font_name:
+            try:
+                with open(font_name, "rb") as font_file:
+                    self._glyph_font = font_file.read()
+            except OSError:
+                # Let parent class report the problem
+                return super().text(string, x, y, color, font_name=font_name, size=size)
+            self._glyph_font_name = font_name
+            self._glyph_cache = dict()
+            self._glyph_cache_order = []
+        font_width = self._glyph_font[0]
+        font_height = self._glyph_font[1]
+
+        for chunk in string.split("\n"):
+            for i, char in enumerate(chunk):
+                char_x = x + (i * (font_width + 1)) * size
+                if (char_x + (font_width * size) > 0 and char_x < self.width
+                        and y + (font_height * size) > 0 and y < self.height
+                        and ord(char) <= 255):
+                    glyph = self._get_glyph(ord(char), size, y & 0x07)
+                    self._blit_glyph(glyph, font_width * size, char_x, y, color)
+            y += font_height * size
+
+    # Get glyph from cache, rendering it if not already present
+    def _get_glyph(self, code, size, offset):
+        key = (code, size, offset)
+        glyph = self._glyph_cache.get(key)
+        if glyph is not None:
+            if self._glyph_cache_order[-1] != key:
+                self._glyph_cache_order.remove(key)
+                self._glyph_cache_order.append(key)
+            return glyph
+
+        glyph = self._render_glyph(code, size, offset)
+        if len(self._glyph_cache_order) >= glyph_cache_size:
+            del self._glyph_cache[self._glyph_cache_order.pop(0)]
+        self._glyph_cache[key] = glyph
+        self._glyph_cache_order.append(key)
+        return glyph
+
+    # Render one character scaled by size, starting offset pixels down from the
+    # top of a stripe. Result is one row of column bytes per stripe covered.
+    def _render_glyph(self, code, size, offset):
+        font_width = self._glyph_font[0]
+        font_height = self._glyph_font[1]
+        glyph_width = font_width * size
+        glyph_height = font_height * size
+        bands = (offset + glyph_height + 7) >> 3
+        shift = bands * 8 - offset - glyph_height
+        glyph = bytearray(bands * glyph_width)
+        for char_x in range(font_width):
+            # Font columns have top row in least significant bit. Build column
+            # of scaled pixels with top row in most significant bit instead.
+            line = self._glyph_font[2 + code * font_width + char_x]
+            column = 0
+            for char_y in range(font_height):
+                column <<= size
+                if (line >> char_y) & 0x1:
+                    column |= (1 << size) - 1
+            column <<= shift
+            for band in range(bands):
+                column_byte = (column >> (8 * (bands - 1 - band))) & 0xFF
+                index = band * glyph_width + char_x * size
+                for scaled_x in range(size):
+                    glyph[index + scaled_x] = column_byte
+        return glyph
+
+    # Draw glyph at x, y, clipped to screen. Set bits are drawn in color, the
+    # rest are left alone.
+    def _blit_glyph(self, glyph, glyph_width, x, y, color):
+        # pylint: disable=too-many-arguments
+        buf = self.buf
+        first_column = max(0, -x)
+        end_column = min(glyph_width, self.width - x)
+        for band in range(len(glyph) // glyph_width):
+            row = (y >> 3) + band
+            if row < 0 or row * 8 >= self.height:
+                continue
+            # Don't draw into rows past bottom of screen
+            mask = 0xFF
+            if row * 8 + 8 > self.height:
+                mask = (0xFF << (row * 8 + 8 - self.height)) & 0xFF
+            index = row * self.stride + x
+            glyph_index = band * glyph_width
+            if color:
+                for i in range(first_column, end_column):
+                    buf[index + i] |= glyph[glyph_index + i] & mask
+            else:
+                for i in range(first_column, end_column):
+                    buf[index + i] &= ~(glyph[glyph_index + i] & mask)
+
+# Kinds of event recorded by K13988 tracing, with meaning of values a and b
+class TraceEvent:
+    TX          = 1 # Command sent: first byte, second byte
+    TX_DATA     = 2 # LCD bulk transfer data sent: length
+    RX          = 3 # Byte received, except repeats of unchanged key scan report: byte
+    ACK         = 4 # Group of commands acknowledged: round trip ms, commands
+    RETRY       = 5 # ACK timeout, resending group: first byte of first command, retry count
+    FAILED      = 6 # Out of retries, commands discarded: first byte of first command, count
+    KEY_DROP    = 7 # Key event queue full, key press and its release lost: keycode
+    REFRESH     = 8 # refresh() complete: duration ms, stripes queued
+
+    names = ("", "tx", "tx_data", "rx", "ack", "retry", "failed", "key_drop", "refresh")
+
+# One priority level of the K13988 transmit queue: a ring buffer of commands,
+# indexed by sequence number. Commands before acked are done, acked up to sent
+# are in flight waiting for ACKs, sent up to queued are waiting to be sent.
+class K13988_TransmitQueue:
+    # Kind of each queued command. LCD bulk transfer header and data are sent
+    # on their own, and nothing may be sent between them. PARTIAL is added to
+    # header and data kinds of uploads covering only part of a stripe.
+    COMMAND = 0
+    BULK_HEADER = 1
+    BULK_DATA = 2
+    PARTIAL = 4
+
+    def __init__(self, length):
+        self.ring = [None] * length
+        self.kind = bytearray(length)
+        self.queued_time = [0] * length
+        self.queued = 0
+        self.sent = 0
+        self.acked = 0
+        self.retry_count = 0
+        # Commands before started have been sent at least once
+        self.started = 0
+        # Commands from failed_start up to failed_end were discarded after
+        # running out of retries.
+        self.failed_start = 0
+        self.failed_end = 0
+        self.completed = asyncio.Event()
+
+        # Queue wait statistics: number of commands sent, and total and longest
+        # milliseconds between being queued and first sent
+        self.wait_count = 0
+        self.wait_total = 0
+        self.wait_max = 0
+
+    # Add command to queue, returns sequence number for complete(). Waits for
+    # room when full. Content must not change until sent.
+    async def submit(self, bytes, kind=COMMAND):
+        assert bytes is not None
+        assert len(bytes) == 2 or 0 < len(bytes) <= 196
+
+        length = len(self.ring)
+        while self.queued - self.acked >= length:
+            self.completed.clear()
+            await self.completed.wait()
+        self.ring[self.queued % length] = bytes
+        self.kind[self.queued % length] = kind
+        self.queued_time[self.queued % length] = supervisor.ticks_ms()
+        self.queued += 1
+        return self.queued
+
+    # Replace command with given sequence number, which must not be sent yet,
+    # and its kind if given
+    def replace(self, sequence, bytes, kind=None):
+        assert sequence > self.sent
+        self.ring[(sequence - 1) % len(self.ring)] = bytes
+        if kind is not None:
+            self.kind[(sequence - 1) % len(self.ring)] = kind
+
+    # Wait until all commands up to and including sequence number are acknowledged
+    async def complete(self, sequence):
+        while self.acked < sequence:
+            self.completed.clear()
+            await self.completed.wait()
+        if self.failed_start < sequence <= self.failed_end:
+            raise RuntimeError("No communication with K13988")
+
+    # Whether the next command to send is bulk transfer data whose header was sent
+    def bulk_data_next(self):
+        return self.sent < self.queued and self.kind[self.sent % len(self.ring)] & ~self.PARTIAL == self.BULK_DATA
+
+    # Whether any command sent and not yet acknowledged is part of a partial
+    # stripe upload
+    def partial_unacked(self):
+        length = len(self.ring)
+        for sequence in range(self.acked, self.sent):
+            if self.kind[sequence % length] & self.PARTIAL:
+                return True
+        return False
+
+    # Update wait statistics for command being sent, if sent for the first time
+    def record_sent(self, now):
+        if self.sent == self.started:
+            wait = _ticks_diff(now, self.queued_time[self.sent % len(self.ring)])
+            self.wait_count += 1
+            self.wait_total += wait
+            if wait > self.wait_max:
+                self.wait_max = wait
+            self.started += 1
+
 class K13988:
-    def __init__(self, tx_pin: microcontroller.Pin, rx_pin: microcontroller.Pin, enable_pin: microcontroller.Pin):
-        # Task synchronization
+    # rx_expecting_ack and key_event_available are the receiver wakeup and key
+    # event signals of a K13988_Panels (lib/k13988_panels.py) this is one of,
+    # whose receiver task reads this UART too. Without them this runs a
+    # receiver task of its own.
+    def __init__(self, tx_pin: microcontroller.Pin, rx_pin: microcontroller.Pin, enable_pin: microcontroller.Pin,
+            rx_expecting_ack=None, key_event_available=None):
+        # Task synchronization. Lock keeps a group of commands (e.g. an LCD
+        # stripe) together in the LCD transmit queue.
         self._transmit_lock = asyncio.Lock()
+        self._tx_submitted = asyncio.Event()
+        self._tx_acknowledged = asyncio.Event()
+        self._shared_receiver = rx_expecting_ack is not None
+        if rx_expecting_ack is None:
+            self._rx_expecting_ack = asyncio.Event()
+            self._key_event_available = asyncio.Event()
+        else:
+            self._rx_expecting_ack = rx_expecting_ack
+            self._key_event_available = key_event_available
         self._transmit_startup = asyncio.Event()
         self._initialization_complete = asyncio.Event()
 
@@ -162,76 +550,433 @@ class K13988:
         self._enable.switch_to_output(False)
         self._uart = busio.UART(tx_pin, rx_pin, baudrate=250000, bits=8, parity=busio.UART.Parity.EVEN, stop=2, timeout=20)
 
-        # Raw frame buffer byte array
+        # Raw frame buffer byte array for application to draw into
         self._framebuffer_bytearray = bytearray(196*5)
+        self._framebuffer_memoryview = memoryview(self._framebuffer_bytearray)
+
+        # Transmit buffer, holding frame buffer content as of the latest
+        # refresh(). Stripes are sent from here, so drawing the next frame
+        # can't tear one still being sent, and comparing against it lets
+        # refresh() skip what hasn't changed since.
+        self._lcd_bytearray = bytearray(196*5)
+        self._lcd_memoryview = memoryview(self._lcd_bytearray)
+        self._lcd_content_valid = False
+        # Start and end column of the part of each stripe to send
+        self._lcd_windows = bytearray(2*5)
+        self._lcd_partial_stripe_update = lcd_partial_stripe_update
+        self._refresh_bytes_saved = 0
+
+        # Sequence number of page command of latest upload queued for each
+        # stripe, and its start and end column. While that upload has not
+        # started, refresh() widens it rather than queuing another.
+        self._lcd_pending = [0] * 5
+        self._lcd_pending_windows = bytearray(2*5)
+        self._refresh_merge_count = 0
+
+        # Display task state. mark_dirty() counts marks since display task last
+        # took a frame, noting supervisor.ticks_ms() of the first, and wakes it.
+        self._display_dirty = asyncio.Event()
+        self._display_marks = 0
+        self._display_mark_time = 0
+        # Frames sent, marks coalesced into a later frame, ticks_ms of first
+        # and latest refresh start, and latency ring buffer in ms
+        self._display_frames = 0
+        self._display_frames_dropped = 0
+        # Refreshes failed in a row, and in total
+        self._display_failures = 0
+        self._display_failures_total = 0
+        self._display_first_time = 0
+        self._display_start_time = 0
+        self._display_latency = array.array('H', [0]) * display_latency_samples
+
+        # FrameRecorder (lib/k13988_recording.py) recording every frame
+        # refresh() sends, if any
+        self._recorder = None
+
+        # Last acknowledged value of each K13988 register, by command byte.
+        # 0x04 is not in here, it passes commands through to the LCD controller.
+        self._register_values = dict()
+        # Control queue sequence number of latest write to each register
+        self._register_pending = dict()
+        self._register_write_count = 0
+        self._register_writes_dropped = 0
+        self._register_writes_merged = 0
 
         # Internal state
         self._last_report = Keycode.NONE
         self._ack_count = 0
         self._led_state = bytearray(b'\x0E\xFD')
-        self._key_event_queue = deque((), key_event_queue_length, True)
+        self._rx_poll_count = 0
+
+        # Key event queue as ring buffer of key numbers, plus 0x100 for a press,
+        # indexed by sequence number. Events from _key_event_read up to
+        # _key_event_write are waiting to be read.
+        self._key_events = array.array('H', [0]) * key_event_queue_length
+        self._key_event_read = 0
+        self._key_event_write = 0
+        # Whether the last key press was discarded, so its release must be too
+        self._key_press_discarded = False
+        self._key_event_overflow_count = 0
+
+        # Number of times each unexpected byte value was received, and
+        # supervisor.ticks_ms() when it was last received
+        self._unexpected_code_counts = array.array('H', [0]) * 256
+        self._unexpected_code_times = array.array('L', [0]) * 256
 
-    # Get reference to raw frame buffer bytearray
+        # Transmit queues. Control commands (LED state) are sent ahead of
+        # initialization and LCD stripe uploads queued before them, in between
+        # groups of those commands.
+        self._tx_control = K13988_TransmitQueue(uart_tx_control_queue_length)
+        self._tx_lcd = K13988_TransmitQueue(uart_tx_queue_length)
+        self._tx_window = uart_tx_window
+        # Number of commands sent in the group now waiting for ACKs, and when
+        self._tx_in_flight = 0
+        self._tx_group_time = 0
+
+        # Trace ring buffer, one array per field, and histograms in ms
+        self._trace_length = trace_length
+        self._trace_count = 0
+        self._trace_time = array.array('L', [0]) * trace_length
+        self._trace_event = bytearray(trace_length)
+        self._trace_a = array.array('H', [0]) * trace_length
+        self._trace_b = array.array('H', [0]) * trace_length
+        self._ack_histogram = array.array('L', [0]) * 16
+        self._refresh_histogram = array.array('L', [0]) * 16
+
+    # Get reference to raw frame buffer bytearray. It may be drawn into at
+    # any time, refresh() copies what it needs before returning.
     def get_frame_buffer_bytearray(self):
         return self._framebuffer_bytearray
 
+    # Get number of bytes refresh() did not have to transmit because the
+    # corresponding stripes (or columns within them) were unchanged since last
+    # sent, or were merged into an upload already queued.
+    def get_refresh_bytes_saved(self):
+        return self._refresh_bytes_saved
+
+    # Record every frame refresh() sends with a FrameRecorder, or stop if None
+    def set_recorder(self, recorder):
+        self._recorder = recorder
+
+    # Get number of stripe uploads refresh() merged into one already queued
+    # by an earlier refresh() instead of queuing another.
+    def get_refresh_merge_count(self):
+        return self._refresh_merge_count
+
+    # Get display task statistics as a tuple of (frames sent, intermediate
+    # frames dropped because a later mark_dirty() came before they were sent,
+    # frames per second achieved, list of latency percentiles in ms, refreshes
+    # failed). Latency is from the first mark_dirty() of a frame to its
+    # refresh completing, over the last display_latency_samples frames.
+    def get_display_stats(self, percentiles=(50, 95, 99)):
+        frames = self._display_frames
+        fps = 0.0
+        elapsed = _ticks_diff(self._display_start_time, self._display_first_time)
+        if frames > 1 and elapsed:
+            fps = (frames - 1) * 1000 / elapsed
+        count = min(frames, len(self._display_latency))
+        latency = sorted(self._display_latency[:count])
+        result = []
+        for percentile in percentiles:
+            if count:
+                result.append(latency[min(count - 1, percentile * count // 100)])
+            else:
+                result.append(0)
+        return (frames, self._display_frames_dropped, fps, result, self._display_failures_total)
+
+    # Get number of times receiver task has checked UART for incoming data.
+    # Sampled over time, shows how much of the scheduler it is using.
+    def get_receiver_poll_count(self):
+        return self._rx_poll_count
+
+    # Get register write statistics as a tuple of (writes requested, dropped
+    # because register already held the value, merged into a write still
+    # waiting to be sent). Each dropped or merged write saves 2 bytes on the wire.
+    def get_register_write_stats(self):
+        return (self._register_write_count, self._register_writes_dropped, self._register_writes_merged)
+
+    # Get transmit queue wait statistics as a tuple of (commands sent, total
+    # milliseconds waited, longest milliseconds waited) for control commands,
+    # then for initialization and LCD commands. Wait is from being queued to
+    # first sent.
+    def get_transmit_wait_stats(self):
+        return tuple((queue.wait_count, queue.wait_total, queue.wait_max) for queue in (self._tx_control, self._tx_lcd))
+
+    # Get ACK round trip time histogram, counts by milliseconds from sending a
+    # group of commands to all of their ACKs arriving. Index 0 counts under
+    # 1ms, index n from 2**(n-1) to under 2**n ms. Only recorded while tracing.
+    def get_ack_histogram(self):
+        return self._ack_histogram
+
+    # Get refresh() duration histogram, in the same form as get_ack_histogram()
+    def get_refresh_histogram(self):
+        return self._refresh_histogram
+
+    # Get traced events, oldest first, as a list of tuples of
+    # (ticks_ms, TraceEvent kind, a, b)
+    def get_trace(self):
+        count = min(self._trace_count, self._trace_length)
+        trace = []
+        for sequence in range(self._trace_count - count, self._trace_count):
+            index = sequence % self._trace_length
+            trace.append((self._trace_time[index], self._trace_event[index], self._trace_a[index], self._trace_b[index]))
+        return trace
+
+    # Print traced events then histograms over serial console as CSV
+    def print_trace(self):
+        print("time_ms,event,a,b")
+        for time, event, a, b in self.get_trace():
+            print("{0},{1},{2},{3}".format(time, TraceEvent.names[event], a, b))
+        print("histogram,bucket,count")
+        for name, histogram in (("ack", self._ack_histogram), ("refresh", self._refresh_histogram)):
+            for bucket in range(len(histogram)):
+                print("{0},{1},{2}".format(name, bucket, histogram[bucket]))
+
+    # Write traced events then histograms to a binary stream (e.g. usb_cdc.data)
+    # little-endian: uint16 event count, per event uint32 ticks_ms, uint8 kind,
+    # uint16 a, uint16 b, then 16 uint32 ACK and 16 uint32 refresh buckets.
+    def write_trace(self, stream):
+        trace = self.get_trace()
+        stream.write(struct.pack('<H', len(trace)))
+        record = bytearray(9)
+        for time, event, a, b in trace:
+            struct.pack_into('<LBHH', record, 0, time, event, a, b)
+            stream.write(record)
+        stream.write(struct.pack('<16L', *self._ack_histogram))
+        stream.write(struct.pack('<16L', *self._refresh_histogram))
+
+    # Record trace event. Callers check _trace_length first.
+    def _trace(self, event, a=0, b=0):
+        index = self._trace_count % self._trace_length
+        self._trace_time[index] = supervisor.ticks_ms()
+        self._trace_event[index] = event
+        self._trace_a[index] = a
+        self._trace_b[index] = b
+        self._trace_count += 1
+
+    # Event set whenever a key event arrives, shared with other panels of a
+    # K13988_Panels
+    def get_key_event_available(self):
+        return self._key_event_available
+
+    # Number of commands sent and waiting for ACK
+    def get_commands_in_flight(self):
+        return self._tx_in_flight
+
     # Data receive task
     async def _uart_receiver(self):
         while True:
-            while self._uart.in_waiting < 1:
+            if self.uart_receive():
+                continue
+            if self._tx_in_flight or uart_rx_poll_interval == 0:
                 await asyncio.sleep(0)
-            data = self._uart.read(1)[0]
+            else:
+                self._rx_expecting_ack.clear()
+                try:
+                    await asyncio.wait_for(self._rx_expecting_ack.wait(), uart_rx_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    # Process everything waiting in UART receive buffer. Returns False if
+    # there was nothing. Called by the receiver task, K13988_Panels's if shared.
+    def uart_receive(self):
+        self._rx_poll_count += 1
+        waiting = self._uart.in_waiting
+        if waiting < 1:
+            return False
 
-            # First successful read complete, exit startup mode
-            self._transmit_startup.set()
+        # First successful read complete, exit startup mode
+        self._transmit_startup.set()
 
+        for data in self._uart.read(waiting):
+            if self._trace_length and data != self._last_report:
+                self._trace(TraceEvent.RX, data)
             if data == 0x20:
                 self._ack_count += 1
             elif data == 0x40:
-                # Ignore 0x40 as I have no idea what it means
-                pass
+                # 0x40 follows every key scan report until initialization
+                # switches to reports of a single byte. I have no idea what
+                # it means, and don't expect it after that.
+                if self._initialization_complete.is_set():
+                    self._record_unexpected_code(data)
             elif data != self._last_report:
-                if (len(self._key_event_queue) < key_event_queue_length):
-                    # Add event to queue reflecting change in key scan state
-                    if self._last_report != Keycode.NONE:
-                        self._key_event_queue.append(Event(self._last_report, False)) # Previous key released
-                    if data != Keycode.NONE:
-                        self._key_event_queue.append(Event(data, True)) # New key pressed
-                else:
-                    # No events are added if queue is full
-                    pass
+                # Every once in a while an unknown code arrives and I
+                # haven't figured out why yet
+                if data < keycode_first or data >= keycode_first + keycode_count or not keycode_known[data - keycode_first]:
+                    self._record_unexpected_code(data)
+                # Add event to queue reflecting change in key scan state
+                if self._last_report != Keycode.NONE:
+                    self._add_key_event(self._last_report, False) # Previous key released
+                if data != Keycode.NONE:
+                    self._add_key_event(data, True) # New key pressed
                 self._last_report = data
             else:
                 # Key matrix scan report unchanged, take no action
                 pass
 
-    # Wait for ACK
-    async def _wait_for_ack(self):
-        while self._ack_count < 1:
-            await asyncio.sleep(0)
+        # Wake transmitter once every command in flight is acknowledged
+        if self._tx_in_flight and self._ack_count >= self._tx_in_flight:
+            self._tx_acknowledged.set()
+        return True
 
-    # Send data to K13988
-    async def _uart_sender(self, bytes):
-        assert bytes is not None
-        assert len(bytes) == 2 or len(bytes) == 196
-
-        retry_count = 0
-        success = False
+    # Add event to key event queue. Only one key is reported pressed at a time,
+    # so keeping a free slot for the release of every press queued means a
+    # release is never lost. A press that doesn't fit is discarded, and so is
+    # its release, so readers always see presses and releases in pairs.
+    def _add_key_event(self, key_number, pressed):
+        if pressed:
+            if key_event_queue_length - (self._key_event_write - self._key_event_read) < 2:
+                self._key_press_discarded = True
+                self._key_event_overflow_count += 1
+                if self._trace_length:
+                    self._trace(TraceEvent.KEY_DROP, key_number)
+                return
+            self._key_events[self._key_event_write % key_event_queue_length] = key_number | 0x100
+        else:
+            if self._key_press_discarded:
+                self._key_press_discarded = False
+                return
+            self._key_events[self._key_event_write % key_event_queue_length] = key_number
+        self._key_event_write += 1
+        self._key_event_available.set()
 
-        while not success:
-            sent = self._uart.write(bytes)
-            assert sent == 2 or len(bytes) == 196
+    # Transmit task sending queued commands to K13988
+    async def _uart_transmitter(self):
+        while True:
+            queue = self._uart_next_queue()
+            if queue is None:
+                self._tx_submitted.clear()
+                await self._tx_submitted.wait()
+                continue
 
+            self._tx_acknowledged.clear()
+            self._uart_write_group(queue)
+            self._rx_expecting_ack.set()
             try:
-                await asyncio.wait_for(self._wait_for_ack(),0.02)
-                self._ack_count -= 1
-                success = True
+                await asyncio.wait_for(self._tx_acknowledged.wait(), uart_tx_ack_timeout)
             except asyncio.TimeoutError:
-                if retry_count < uart_tx_retry_limit:
-                    print("Retrying 0x{0:X} 0x{1:X}".format(bytes[0],bytes[1]))
-                    retry_count += 1
+                # ACKs may be waiting unread if the receiver couldn't run in
+                # time, e.g. while writes to other panels' UARTs held up the
+                # processor. Resending then would have them counted for the
+                # wrong commands.
+                self.uart_receive()
+            if self._tx_acknowledged.is_set():
+                if self._trace_length:
+                    round_trip = _ticks_diff(supervisor.ticks_ms(), self._tx_group_time)
+                    _histogram_add(self._ack_histogram, round_trip)
+                    self._trace(TraceEvent.ACK, min(round_trip, 0xFFFF), self._tx_in_flight)
+                self._record_register_values(queue)
+                queue.acked = queue.sent
+                queue.retry_count = 0
+                queue.completed.set()
+            else:
+                self._uart_retry(queue)
+            self._tx_in_flight = 0
+
+    # Update register values from the group of commands just acknowledged
+    def _record_register_values(self, queue):
+        length = len(queue.ring)
+        for sequence in range(queue.acked, queue.sent):
+            command = queue.ring[sequence % length]
+            if queue.kind[sequence % length] == K13988_TransmitQueue.COMMAND and command[0] != 0x04:
+                self._register_values[command[0]] = command[1]
+
+    # Queue to send the next group of commands from, None if all are empty.
+    # Control commands go first once initialization is complete, except
+    # between an LCD bulk transfer header and its data.
+    def _uart_next_queue(self):
+        if self._tx_control.sent < self._tx_control.queued:
+            if self._initialization_complete.is_set() and not self._tx_lcd.bulk_data_next():
+                return self._tx_control
+        if self._tx_lcd.sent < self._tx_lcd.queued:
+            return self._tx_lcd
+        return None
+
+    # Write next group of queued commands to UART: up to _tx_window short
+    # commands, or a bulk transfer header or data on its own.
+    def _uart_write_group(self, queue):
+        self._ack_count = 0
+        now = supervisor.ticks_ms()
+        self._tx_group_time = now
+        length = len(queue.ring)
+        while queue.sent < queue.queued and queue.sent - queue.acked < self._tx_window:
+            command = queue.ring[queue.sent % length]
+            bulk = queue.kind[queue.sent % length] != K13988_TransmitQueue.COMMAND
+            if bulk and queue.sent > queue.acked:
+                break
+            sent = self._uart.write(command)
+            assert sent == len(command)
+            if self._trace_length:
+                if queue.kind[queue.sent % length] & ~K13988_TransmitQueue.PARTIAL == K13988_TransmitQueue.BULK_DATA:
+                    self._trace(TraceEvent.TX_DATA, len(command))
                 else:
-                    raise RuntimeError("No communication with K13988")
+                    self._trace(TraceEvent.TX, command[0], command[1])
+            queue.record_sent(now)
+            queue.sent += 1
+            if bulk:
+                break
+        self._tx_in_flight = queue.sent - queue.acked
+
+    # ACK timeout: go back and resend the group of commands missing ACKs
+    def _uart_retry(self, queue):
+        command = queue.ring[queue.acked % len(queue.ring)]
+        if queue.retry_count < uart_tx_retry_limit:
+            if queue.kind[queue.acked % len(queue.ring)] & ~K13988_TransmitQueue.PARTIAL == K13988_TransmitQueue.BULK_DATA:
+                # LCD data of a narrow column window may be a single byte
+                print("Retrying {0} bytes of LCD data".format(len(command)))
+            else:
+                print("Retrying 0x{0:X} 0x{1:X}".format(command[0],command[1]))
+            queue.retry_count += 1
+            if self._trace_length:
+                self._trace(TraceEvent.RETRY, command[0], queue.retry_count)
+        else:
+            if self._trace_length:
+                self._trace(TraceEvent.FAILED, command[0], queue.queued - queue.acked)
+            if queue is self._tx_lcd and self._lcd_partial_stripe_update and queue.partial_unacked():
+                # The LCD controller may not take column addressing, don't
+                # ask it to again
+                print("Partial stripe update failed, sending full stripes from now on")
+                self._lcd_partial_stripe_update = False
+            # Give up on everything queued, senders waiting on them get RuntimeError
+            queue.failed_start = queue.acked
+            queue.failed_end = queue.queued
+            queue.acked = queue.queued
+            queue.started = queue.queued
+            queue.retry_count = 0
+            queue.completed.set()
+            # Register values and LCD content are unknown after a failed transfer
+            self._register_values.clear()
+            if queue is self._tx_lcd:
+                self._lcd_content_valid = False
+        queue.sent = queue.acked
+
+    # Add command to LCD transmit queue, returns sequence number for
+    # _tx_lcd.complete(). kind marks LCD bulk transfer header and data.
+    async def _uart_submit(self, bytes, kind=K13988_TransmitQueue.COMMAND):
+        sequence = await self._tx_lcd.submit(bytes, kind)
+        self._tx_submitted.set()
+        return sequence
+
+    # Write value to K13988 register with a control command, sent ahead of
+    # queued LCD updates, and wait for it to be acknowledged. Nothing is sent
+    # if the register already holds value. If an earlier write to the register
+    # is still waiting to be sent, it is changed to write value instead.
+    async def _write_register(self, register, value):
+        queue = self._tx_control
+        self._register_write_count += 1
+        pending = self._register_pending.get(register, 0)
+        if pending > queue.sent:
+            queue.replace(pending, bytes((register, value)))
+            self._register_writes_merged += 1
+            await queue.complete(pending)
+            return
+        if pending <= queue.acked and self._register_values.get(register) == value:
+            self._register_writes_dropped += 1
+            return
+        sequence = await queue.submit(bytes((register, value)))
+        self._register_pending[register] = sequence
+        self._tx_submitted.set()
+        await queue.complete(sequence)
 
     # Initialization sequence for NEC K13988 chip
     # Values came from logic analyzer watching behavior of a running MX340
@@ -268,37 +1013,211 @@ class K13988:
 
         async with self._transmit_lock:
             for init_command in self._k13988_init:
-                await self._uart_sender(init_command)
+                sequence = await self._uart_submit(init_command)
+        await self._tx_lcd.complete(sequence)
 
         # Set initialization complete event
         self._initialization_complete.set()
 
-    # Following precedence of RGBMatrix, method to send frame buffer to screen
-    async def refresh(self):
+    # Following precedence of RGBMatrix, method to send frame buffer to screen.
+    # Only the changed part of each stripe since it was last sent is transmitted.
+    # Frame buffer content is copied when called, so drawing may continue while
+    # it is sent. Set wait to False to return without waiting for that.
+    async def refresh(self, wait=True):
+        partial = self._lcd_partial_stripe_update
+        if self._trace_length:
+            refresh_start = supervisor.ticks_ms()
         async with self._transmit_lock:
-            for stripe in range(5):
-                await self._send_lcd_stripe(stripe)
+            self._lcd_update_transmit_buffer()
+            if self._recorder is not None:
+                self._recorder.add_frame(self._lcd_memoryview)
+            stripes, sequence = await self._queue_lcd_stripes()
+        if not wait:
+            return
+        try:
+            await self._tx_lcd.complete(sequence)
+        except RuntimeError:
+            # Only when _uart_retry() gave up on a partial stripe upload and
+            # turned them off: LCD content is now unknown, so this sends every
+            # stripe in full.
+            if not partial or self._lcd_partial_stripe_update:
+                raise
+            async with self._transmit_lock:
+                self._lcd_update_transmit_buffer()
+                stripes, sequence = await self._queue_lcd_stripes()
+            await self._tx_lcd.complete(sequence)
+        if self._trace_length:
+            duration = _ticks_diff(supervisor.ticks_ms(), refresh_start)
+            _histogram_add(self._refresh_histogram, duration)
+            self._trace(TraceEvent.REFRESH, min(duration, 0xFFFF), stripes)
+
+    # Queue uploads of the stripe windows found by _lcd_update_transmit_buffer().
+    # Call with _transmit_lock held. Returns number of stripes uploaded and
+    # sequence number for _tx_lcd.complete().
+    async def _queue_lcd_stripes(self):
+        stripes = 0
+        for stripe in range(5):
+            start = self._lcd_windows[stripe*2]
+            end = self._lcd_windows[stripe*2+1]
+            if not end:
+                self._refresh_bytes_saved += self._stripe_transmit_length
+                continue
+            stripes += 1
+            if self._lcd_pending[stripe] > self._tx_lcd.sent:
+                self._merge_lcd_stripe(stripe, start, end)
+            else:
+                await self._send_lcd_stripe(stripe, start, end)
+        self._lcd_content_valid = True
+        # Uploads queued earlier may carry some of this frame
+        return stripes, self._tx_lcd.queued
+
+    # Have display task refresh screen with frame buffer content as of when it
+    # next gets to run, at most once per display_refresh_interval. For
+    # applications that redraw often, e.g. on every key event: unlike awaiting
+    # refresh() each time, frames drawn faster than they can be sent are skipped.
+    def mark_dirty(self):
+        if not self._display_marks:
+            self._display_mark_time = supervisor.ticks_ms()
+        self._display_marks += 1
+        self._display_dirty.set()
+
+    # Display task, refreshing screen after mark_dirty()
+    async def _display_refresher(self):
+        interval = int(display_refresh_interval * 1000)
+        retry_max = max(interval, int(display_retry_max_interval * 1000))
+        while True:
+            await self._display_dirty.wait()
+            if self._display_frames or self._display_failures:
+                wait = interval
+                if self._display_failures:
+                    wait = min(max(interval, 1) << min(self._display_failures, 16), retry_max)
+                remaining = wait - _ticks_diff(supervisor.ticks_ms(), self._display_start_time)
+                if remaining > 0:
+                    await asyncio.sleep(remaining / 1000)
+
+            # Frame buffer is copied before refresh() first awaits, so any
+            # mark_dirty() from here on needs another frame
+            self._display_dirty.clear()
+            self._display_frames_dropped += self._display_marks - 1
+            self._display_marks = 0
+            mark_time = self._display_mark_time
+            self._display_start_time = supervisor.ticks_ms()
+            try:
+                await self.refresh()
+            except RuntimeError as error:
+                print("Display refresh failed, trying again:", error)
+                self._display_failures += 1
+                self._display_failures_total += 1
+                self.mark_dirty()
+                continue
+            self._display_failures = 0
+
+            if not self._display_frames:
+                self._display_first_time = self._display_start_time
+            latency = _ticks_diff(supervisor.ticks_ms(), mark_time)
+            self._display_latency[self._display_frames % len(self._display_latency)] = min(latency, 0xFFFF)
+            self._display_frames += 1
 
     # Frame buffer is made of 5 stripes. During data transmission each stripe is
     # identified with the corresponding hexadecimal value
     _stripe_id_lookup = [b'\x04\x4D', b'\x04\xCD', b'\x04\x2D', b'\x04\xAD', b'\x04\x6D']
 
-    # Send to LCD one horizontal stripes of 8 vertical pixels.
-    async def _send_lcd_stripe(self, stripe_num: int):
-        stripe_slice_start = stripe_num*196
-        stripe_slice_end = stripe_slice_start+196
+    # Bytes on the wire to send one stripe: four 2-byte commands then 196 bytes of pixels
+    _stripe_transmit_length = 4*2 + 196
 
-        await self._uart_sender(self._stripe_id_lookup[stripe_num])
-        await self._uart_sender(b'\x04\xC8')
-        await self._uart_sender(b'\x04\x30')
-        await self._uart_sender(b'\x06\xC4') # Incoming bulk transmission of 196 (0xC4) bytes
+    # Second byte of each 0x04 command is passed to the LCD controller
+    # least-significant bit first, so these are bit-reversed versions of the
+    # familiar ST7565-style command set. (0x4D is 0xB2 "page 2", 0xF5 is 0xAF
+    # "display on".) Read that way, 0x04 0xC8 + 0x04 0x30 are 0x13 + 0x0C:
+    # "column address 0x3C", the controller RAM column shown at x=0.
+    # Starting a bulk write at 0x3C+x updates only columns from x onwards.
+    _lcd_column_offset = 0x3C
+    _lcd_column_high_lookup = [bytes((0x04, _bit_reverse(0x10 | n))) for n in range(16)]
+    _lcd_column_low_lookup = [bytes((0x04, _bit_reverse(n))) for n in range(16)]
 
-        await self._uart_sender(self._framebuffer_bytearray[stripe_slice_start:stripe_slice_end])
+    # Find part of each stripe in frame buffer different from transmit buffer,
+    # record it in _lcd_windows and copy it to transmit buffer. Nothing awaits
+    # in here, so the copy is a consistent snapshot of the frame buffer.
+    def _lcd_update_transmit_buffer(self):
+        framebuffer = self._framebuffer_memoryview
+        lcd = self._lcd_memoryview
+        for stripe in range(5):
+            stripe_slice_start = stripe*196
+            stripe_slice_end = stripe_slice_start+196
+            if not self._lcd_content_valid:
+                first = stripe_slice_start
+                last = stripe_slice_end - 1
+            elif framebuffer[stripe_slice_start:stripe_slice_end] == lcd[stripe_slice_start:stripe_slice_end]:
+                self._lcd_windows[stripe*2] = 0
+                self._lcd_windows[stripe*2+1] = 0
+                continue
+            elif not self._lcd_partial_stripe_update:
+                first = stripe_slice_start
+                last = stripe_slice_end - 1
+            else:
+                first = stripe_slice_start
+                while framebuffer[first] == lcd[first]:
+                    first += 1
+                last = stripe_slice_end - 1
+                while framebuffer[last] == lcd[last]:
+                    last -= 1
+            lcd[first:last+1] = framebuffer[first:last+1]
+            self._lcd_windows[stripe*2] = first - stripe_slice_start
+            self._lcd_windows[stripe*2+1] = last + 1 - stripe_slice_start
+
+    # Queue transmission to LCD of one horizontal stripe of 8 vertical pixels,
+    # or the columns from start up to (not including) end within that stripe,
+    # from transmit buffer.
+    async def _send_lcd_stripe(self, stripe_num: int, start: int = 0, end: int = 196):
+        stripe_slice_start = stripe_num*196 + start
+        stripe_slice_end = stripe_num*196 + end
+
+        self._lcd_pending[stripe_num] = await self._uart_submit(self._stripe_id_lookup[stripe_num])
+        self._lcd_pending_windows[stripe_num*2] = start
+        self._lcd_pending_windows[stripe_num*2+1] = end
+        if start == 0 and end == 196:
+            await self._uart_submit(b'\x04\xC8')
+            await self._uart_submit(b'\x04\x30')
+            await self._uart_submit(b'\x06\xC4', K13988_TransmitQueue.BULK_HEADER) # Incoming bulk transmission of 196 (0xC4) bytes
+        else:
+            column = self._lcd_column_offset + start
+            await self._uart_submit(self._lcd_column_high_lookup[column >> 4])
+            await self._uart_submit(self._lcd_column_low_lookup[column & 0x0F])
+            await self._uart_submit(bytes((0x06, end - start)), K13988_TransmitQueue.BULK_HEADER | K13988_TransmitQueue.PARTIAL)
+
+        await self._uart_submit(self._lcd_memoryview[stripe_slice_start:stripe_slice_end],
+            K13988_TransmitQueue.BULK_DATA | self._lcd_partial_kind(start, end))
+        self._refresh_bytes_saved += 196 - (end - start)
+
+    # Transmit queue kind flag for LCD bulk transfer of columns start up to end
+    @staticmethod
+    def _lcd_partial_kind(start, end):
+        return 0 if start == 0 and end == 196 else K13988_TransmitQueue.PARTIAL
+
+    # Widen upload of stripe queued by an earlier refresh, and not yet started,
+    # to also cover columns from start up to end.
+    def _merge_lcd_stripe(self, stripe_num: int, start: int, end: int):
+        pending = self._lcd_pending[stripe_num]
+        pending_start = self._lcd_pending_windows[stripe_num*2]
+        pending_end = self._lcd_pending_windows[stripe_num*2+1]
+        start = min(start, pending_start)
+        end = max(end, pending_end)
+
+        column = self._lcd_column_offset + start
+        partial = self._lcd_partial_kind(start, end)
+        self._tx_lcd.replace(pending + 1, self._lcd_column_high_lookup[column >> 4])
+        self._tx_lcd.replace(pending + 2, self._lcd_column_low_lookup[column & 0x0F])
+        self._tx_lcd.replace(pending + 3, bytes((0x06, end - start)), K13988_TransmitQueue.BULK_HEADER | partial)
+        self._tx_lcd.replace(pending + 4, self._lcd_memoryview[stripe_num*196 + start:stripe_num*196 + end], K13988_TransmitQueue.BULK_DATA | partial)
+        self._lcd_pending_windows[stripe_num*2] = start
+        self._lcd_pending_windows[stripe_num*2+1] = end
+
+        self._refresh_merge_count += 1
+        self._refresh_bytes_saved += self._stripe_transmit_length - ((end - start) - (pending_end - pending_start))
 
     # Transmit LED sate to K13988
     async def _send_led_state(self):
-        async with self._transmit_lock:
-            await self._uart_sender(self._led_state)
+        await self._write_register(self._led_state[0], self._led_state[1])
 
     # Update bit flag corresponding to In Use/Memory LED based on parameter
     async def in_use_led(self, newState):
@@ -318,20 +1237,70 @@ class K13988:
 
     # Get a key event. (If no event, returns None)
     def get_key_event(self):
-        if len(self._key_event_queue) == 0:
+        if self._key_event_read == self._key_event_write:
             return None
-        else:
-            return self._key_event_queue.popleft()
+        value = self._key_events[self._key_event_read % key_event_queue_length]
+        self._key_event_read += 1
+        return Event(value & 0xFF, value > 0xFF)
+
+    # Fill in KeyEvent with next key event. Returns False if there is none.
+    def get_key_event_into(self, event):
+        if self._key_event_read == self._key_event_write:
+            return False
+        value = self._key_events[self._key_event_read % key_event_queue_length]
+        self._key_event_read += 1
+        event.key_number = value & 0xFF
+        event.pressed = value > 0xFF
+        event.released = not event.pressed
+        return True
+
+    # Wait for next key event. Fills in and returns a KeyEvent if given one,
+    # otherwise returns a new keypad.Event.
+    async def next_key_event(self, event=None):
+        while self._key_event_read == self._key_event_write:
+            self._key_event_available.clear()
+            await self._key_event_available.wait()
+        if event is None:
+            value = self._key_events[self._key_event_read % key_event_queue_length]
+            self._key_event_read += 1
+            return Event(value & 0xFF, value > 0xFF)
+        self.get_key_event_into(event)
+        return event
+
+    # Get list of (byte value, times received, ticks_ms when last received) for
+    # every unexpected byte value received from K13988: unknown key scan codes,
+    # and 0x40 after initialization.
+    def get_unexpected_codes(self):
+        return [(code, self._unexpected_code_counts[code], self._unexpected_code_times[code])
+            for code in range(256) if self._unexpected_code_counts[code]]
+
+    # Count unexpected byte value received from K13988
+    def _record_unexpected_code(self, code):
+        if self._unexpected_code_counts[code] < 0xFFFF:
+            self._unexpected_code_counts[code] += 1
+        self._unexpected_code_times[code] = supervisor.ticks_ms()
+
+    # Get number of key presses discarded, with their release, because key
+    # event queue was full
+    def get_key_event_overflow_count(self):
+        return self._key_event_overflow_count
 
     # Asynchronous context manager entry to set up K13988 communications
     async def __aenter__(self):
-        # Soft reset K13988 with disable + enable
+        # Soft reset K13988 with disable + enable. LCD content and register
+        # values are lost.
+        self._lcd_content_valid = False
+        self._register_values.clear()
         self._enable.value = False
         await asyncio.sleep(0.25)
         self._enable.value = True
 
-        # Start listener for K13988 data
-        self.receiver_task = asyncio.create_task(self._uart_receiver())
+        # Start listener for K13988 data, unless K13988_Panels runs one for all,
+        # and transmit queue
+        if not self._shared_receiver:
+            self.receiver_task = asyncio.create_task(self._uart_receiver())
+        self.transmitter_task = asyncio.create_task(self._uart_transmitter())
+        self.display_task = asyncio.create_task(self._display_refresher())
 
         # Send initialization sequence
         await self._initialize_k13988()
@@ -342,7 +1311,10 @@ class K13988:
     # Asynchronous context manager exit to clean up K13988 communications
     async def __aexit__(self, exc_type, exc, tb):
         self._enable.value = False
-        self.receiver_task.cancel()
+        if not self._shared_receiver:
+            self.receiver_task.cancel()
+        self.transmitter_task.cancel()
+        self.display_task.cancel()
 
 # Blink "In Use/Memory" LED
 async def inuse_blinker(k13988):
@@ -366,68 +1338,186 @@ async def wifi_blinker(k13988):
         await k13988.wifi_led(False)
         await asyncio.sleep(0.5)
 
-# Test FrameBuffer support by writing name of pressed key
+# Get name string to display for a key. Unknown codes are counted by
+# K13988.get_unexpected_codes() rather than reported here.
+def keycode_name(key_number):
+    if keycode_first <= key_number < keycode_first + keycode_count:
+        return keycode_names[key_number - keycode_first]
+    return "0x{0:X}".format(key_number)
+
+# Position of key name label, centered on screen
+def key_label_position(key_name):
+    text_x = round((196-(len(key_name)*(6*key_label_size)))/2)
+    text_y = round((34 - (9*key_label_size))/2)
+    return text_x, text_y
+
+# Test FrameBuffer support by drawing name of pressed key
+def draw_keycode_string(framebuffer, key_number):
+    key_name = keycode_name(key_number)
+    text_x, text_y = key_label_position(key_name)
+
+    framebuffer.fill(0)
+    framebuffer.text(key_name, text_x, text_y, 1, font_name=key_label_font, size=key_label_size)
+
+# Draw name of pressed key and send it to screen
 async def write_keycode_string(k13988, framebuffer, key_number):
-    text_size = 2
-    if key_number in keycode_string:
-        key_name = keycode_string[key_number]
-    else:
-        # Every once in a while this happens and I haven't figured out why yet
-        key_name = "0x{0:X}".format(key_number)
-        print("Unexpected key number {0}".format(key_name))
-    text_x = round((196-(len(key_name)*(6*text_size)))/2)
-    text_y = round((34 - (9*text_size))/2)
+    draw_keycode_string(framebuffer, key_number)
+    await k13988.refresh()
+
+# Render label of every key in keycode_string. Each is kept as the smallest
+# block of frame buffer bytes holding all its set pixels:
+# (first stripe, stripe count, x, width, bytes one stripe after another)
+# Labels are in a list indexed by scan code - keycode_first, None for codes
+# without one.
+def render_key_labels():
+    framebuffer = K13988_FrameBuffer(bytearray(196*5))
+    labels = [None] * keycode_count
+    for key_number, key_name in keycode_string.items():
+        text_x, text_y = key_label_position(key_name)
+        framebuffer.fill(0)
+        framebuffer.text(key_name, text_x, text_y, 1, font_name=key_label_font, size=key_label_size)
+
+        stripes = [stripe for stripe in range(5) if any(framebuffer.buf[stripe*196:stripe*196+196])]
+        if not stripes:
+            labels[key_number - keycode_first] = (0, 0, 0, 0, b'')
+            continue
+        columns = [x for x in range(196) if any(framebuffer.buf[stripe*196+x] for stripe in stripes)]
+        first_stripe = stripes[0]
+        stripe_count = stripes[-1] - first_stripe + 1
+        x = columns[0]
+        width = columns[-1] - x + 1
+        data = bytearray()
+        for stripe in range(first_stripe, first_stripe + stripe_count):
+            data.extend(framebuffer.buf[stripe*196+x:stripe*196+x+width])
+        labels[key_number - keycode_first] = (first_stripe, stripe_count, x, width, bytes(data))
+    return labels
+
+# Key labels file is a count byte, then for each label 5 header bytes (key
+# number, first stripe, stripe count, x, width) followed by its data bytes.
+def save_key_labels(labels, file_name):
+    with open(file_name, "wb") as label_file:
+        label_file.write(bytes((key_label_count(labels),)))
+        for index, label in enumerate(labels):
+            if label is None:
+                continue
+            first_stripe, stripe_count, x, width, data = label
+            label_file.write(bytes((keycode_first + index, first_stripe, stripe_count, x, width)))
+            label_file.write(data)
+
+# Returns None if file could not be read
+def load_key_labels(file_name):
+    try:
+        with open(file_name, "rb") as label_file:
+            content = label_file.read()
+    except OSError:
+        return None
+    labels = [None] * keycode_count
+    index = 1
+    for _ in range(content[0]):
+        key_number, first_stripe, stripe_count, x, width = content[index:index+5]
+        index += 5
+        labels[key_number - keycode_first] = (first_stripe, stripe_count, x, width, content[index:index+stripe_count*width])
+        index += stripe_count*width
+    return labels
+
+# Number of keys with a label
+def key_label_count(labels):
+    return sum(1 for label in labels if label is not None)
+
+# Bytes of memory used by label data and headers
+def key_labels_size(labels):
+    return sum(5 + len(label[4]) for label in labels if label is not None)
+
+# Draw name of key using pre-rendered labels, falling back to drawing text
+# for keys without one.
+def draw_key_label(framebuffer, labels, key_number):
+    label = None
+    if keycode_first <= key_number < keycode_first + keycode_count:
+        label = labels[key_number - keycode_first]
+    if label is None:
+        draw_keycode_string(framebuffer, key_number)
+        return
+    first_stripe, stripe_count, x, width, data = label
+    data = memoryview(data)
 
     framebuffer.fill(0)
-    framebuffer.text(key_name, text_x, text_y, 1, font_name="lib/font5x8.bin", size=text_size)
+    for stripe in range(stripe_count):
+        index = (first_stripe + stripe)*196 + x
+        framebuffer.buf[index:index+width] = data[stripe*width:stripe*width+width]
+
+# Draw name of key using pre-rendered labels and send it to screen
+async def write_key_label(k13988, framebuffer, labels, key_number):
+    draw_key_label(framebuffer, labels, key_number)
     await k13988.refresh()
 
-# Print key events to serial console
+# Print key events to serial console, showing name of key pressed on screen.
+# Screen updates go through the display task, so typing faster than they can
+# be sent shows the latest key rather than falling behind.
 async def printkeys(k13988):
     print("Starting printkeys()")
 
     framebuffer = K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
-    await write_keycode_string(k13988, framebuffer, Keycode.NONE)
+    labels = [None] * keycode_count
+    if key_label_precompute:
+        labels = load_key_labels(key_label_file)
+        if labels is None:
+            labels = render_key_labels()
+        print("Key labels use {0} bytes".format(key_labels_size(labels)))
+    await write_key_label(k13988, framebuffer, labels, Keycode.NONE)
 
+    key = KeyEvent()
     while True:
-        key = k13988.get_key_event()
-        if key:
-            if key.pressed:
-                await write_keycode_string(k13988, framebuffer, key.key_number)
-            else:
-                await write_keycode_string(k13988, framebuffer, Keycode.NONE)
-        await asyncio.sleep(0)
+        await k13988.next_key_event(key)
+        if key.pressed:
+            draw_key_label(framebuffer, labels, key.key_number)
+        else:
+            draw_key_label(framebuffer, labels, Keycode.NONE)
+        k13988.mark_dirty()
 
 # Verify functionality of direct-wired components:
-# * Buttons: "On" and "Stop"
+# * Buttons: "On" and "Stop", read from InputEvents
 # * LEDs: "On" and "Alarm"
-async def direct_wired(k13988):
+async def direct_wired(inputs):
     alarm_led = digitalio.DigitalInOut(board.GP3)
     alarm_led.switch_to_output(False)
 
     power_led = digitalio.DigitalInOut(board.GP4)
     power_led.switch_to_output(False)
 
-    keys = Keys((board.GP5, board.GP6), value_when_pressed=False, pull=True)
-
+    event = KeyEvent()
     while True:
-        event = keys.events.get()
-        if event and event.pressed:
+        await inputs.next_key_event(event, KeyEvent.DIRECT)
+        if event.pressed:
             if event.key_number == 0:
                 power_led.value = not power_led.value
             elif event.key_number == 1:
                 alarm_led.value = not alarm_led.value
             else:
                 print("Unexpected key number {0} received".format(event.key_number))
-        await asyncio.sleep(0)
+
+# Direct-wired buttons as keypad.Keys
+def direct_wired_keys():
+    return Keys(direct_wired_key_pins, value_when_pressed=False, pull=True)
 
 async def main():
     print("Starting main()")
-    async with K13988(board.GP0, board.GP1, board.GP2) as k13988:
-        await asyncio.gather(
-            inuse_blinker(k13988),
-            wifi_blinker(k13988),
-            direct_wired(k13988),
-            printkeys(k13988))
-
-asyncio.run(main())
+    if len(panel_pins) == 1:
+        async with K13988(*panel_pins[0]) as k13988:
+            async with InputEvents(k13988, direct_wired_keys(), direct_wired_poll_interval) as inputs:
+                await asyncio.gather(
+                    inuse_blinker(k13988),
+                    wifi_blinker(k13988),
+                    direct_wired(inputs),
+                    printkeys(k13988))
+    else:
+        # Only needed with several panels, so not loaded otherwise
+        from k13988_panels import K13988_Panels
+        async with K13988_Panels(K13988, panel_pins, uart_rx_poll_interval) as panels:
+            async with InputEvents(panels, direct_wired_keys(), direct_wired_poll_interval) as inputs:
+                tasks = [direct_wired(inputs)]
+                for k13988 in panels.panels:
+                    tasks.extend((inuse_blinker(k13988), wifi_blinker(k13988), printkeys(k13988)))
+                await asyncio.gather(*tasks)
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,215 @@
+# Benchmarks for mx340_interface frame buffer drawing and K13988 refresh.
+#
+#   python benchmark.py run [--output results.json]
+#   python benchmark.py compare before.json after.json [--threshold 0.1]
+#
+# Drawing benchmarks are timed on this desktop, so they are only comparable
+# between runs on the same machine. Key label refresh is timed in virtual
+# time against the simulated K13988 and is comparable anywhere, but covers
+# scheduling and UART time only, not time spent drawing.
+#
+# compare exits with status 1 if any metric got worse by more than threshold
+# (a fraction, default 10%).
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+
+import measure
+import mx340
+import virtual_time
+from k13988_sim import K13988Model
+
+# Whether a larger value of each metric is better
+HIGHER_IS_BETTER = {
+    "ops_per_sec": True,
+    "latency_ms": False,
+    "latency_p95_ms": False,
+    "bytes_on_wire": False,
+    "label_bytes": False,
+}
+
+# Best of this many repeats is reported for desktop-timed benchmarks
+REPEAT = 5
+
+FONT_NAME = "lib/font5x8.bin"
+
+def _ops_per_sec(function, operations):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return {"ops_per_sec": operations / best}
+
+def _framebuffer(module):
+    return module.K13988_FrameBuffer(bytearray(196*5))
+
+def bench_set_pixel(module):
+    framebuffer = _framebuffer(module)
+    set_pixel = module.MVMSBFormat.set_pixel
+    def run():
+        for y in range(34):
+            for x in range(196):
+                set_pixel(framebuffer, x, y, 1)
+    return _ops_per_sec(run, 196*34)
+
+def bench_get_pixel(module):
+    framebuffer = _framebuffer(module)
+    get_pixel = module.MVMSBFormat.get_pixel
+    def run():
+        for y in range(34):
+            for x in range(196):
+                get_pixel(framebuffer, x, y)
+    return _ops_per_sec(run, 196*34)
+
+def bench_fill(module):
+    framebuffer = _framebuffer(module)
+    def run():
+        for count in range(1000):
+            framebuffer.format.fill(framebuffer, count & 1)
+    return _ops_per_sec(run, 1000)
+
+# Rectangle covering the key label area, not aligned to stripes
+def bench_fill_rect(module):
+    framebuffer = _framebuffer(module)
+    def run():
+        for count in range(200):
+            framebuffer.format.fill_rect(framebuffer, 10, 7, 176, 20, count & 1)
+    return _ops_per_sec(run, 200)
+
+def _bench_text(size):
+    def bench(module):
+        framebuffer = _framebuffer(module)
+        def run():
+            for _ in range(100):
+                framebuffer.text("Redial/Pause", 0, 0, 1, font_name=FONT_NAME, size=size)
+        return _ops_per_sec(run, 100)
+    return bench
+
+class _NoRefresh:
+    async def refresh(self):
+        pass
+
+# Run coroutine that never actually waits, without an event loop's overhead
+def _complete(coroutine):
+    try:
+        coroutine.send(None)
+    except StopIteration:
+        return
+    raise RuntimeError("Coroutine did not complete")
+
+def _key_label_ops(module, write):
+    framebuffer = _framebuffer(module)
+    panel = _NoRefresh()
+    key_numbers = list(module.keycode_string)
+    def run():
+        for key_number in key_numbers:
+            _complete(write(panel, framebuffer, key_number))
+    return _ops_per_sec(run, len(key_numbers))
+
+# Key label redraw without refresh: drawing text, and copying pre-rendered labels
+def bench_key_label_text(module):
+    return _key_label_ops(module, module.write_keycode_string)
+
+def bench_key_label_copy(module):
+    labels = module.render_key_labels()
+    result = _key_label_ops(module, lambda panel, framebuffer, key_number: module.write_key_label(panel, framebuffer, labels, key_number))
+    result["label_bytes"] = module.key_labels_size(labels)
+    return result
+
+# Key label redraw and refresh, as printkeys() does for every key event
+async def _keycode_refresh(module):
+    loop = asyncio.get_running_loop()
+    model = K13988Model(measure.ACK_DELAY)
+    async with measure.connect_panel(module, model) as k13988:
+        framebuffer = module.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+        await module.write_keycode_string(k13988, framebuffer, module.Keycode.NONE)
+        latency = []
+        sent = model.bytes_received
+        for key_name in measure.KEY_SEQUENCE:
+            for key_number in (getattr(module.Keycode, key_name), module.Keycode.NONE):
+                start = loop.time()
+                await module.write_keycode_string(k13988, framebuffer, key_number)
+                latency.append(loop.time() - start)
+        return latency, (model.bytes_received - sent) / len(latency)
+
+def bench_keycode_refresh(module):
+    latency, bytes_on_wire = virtual_time.run(_keycode_refresh(module))
+    return {
+        "latency_ms": measure._mean(latency) * 1000,
+        "latency_p95_ms": measure._percentile(latency, 0.95) * 1000,
+        "bytes_on_wire": bytes_on_wire,
+    }
+
+BENCHMARKS = {
+    "set_pixel": bench_set_pixel,
+    "get_pixel": bench_get_pixel,
+    "fill": bench_fill,
+    "fill_rect": bench_fill_rect,
+    "text_size_1": _bench_text(1),
+    "text_size_2": _bench_text(2),
+    "text_size_3": _bench_text(3),
+    "key_label_text": bench_key_label_text,
+    "key_label_copy": bench_key_label_copy,
+    "keycode_refresh": bench_keycode_refresh,
+}
+
+def run(output):
+    module = mx340.load()
+    results = {}
+    for name, bench in BENCHMARKS.items():
+        results[name] = bench(module)
+        print("{0:<16} {1}".format(name, "  ".join("{0} {1:.6g}".format(metric, value) for metric, value in results[name].items())))
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    return 0
+
+def compare(before, after, threshold):
+    with open(before) as before_file:
+        before_results = json.load(before_file)["results"]
+    with open(after) as after_file:
+        after_results = json.load(after_file)["results"]
+
+    regressions = 0
+    print("{0:<16} {1:<16} {2:>12} {3:>12} {4:>8}".format("benchmark", "metric", "before", "after", "change"))
+    for name, metrics in after_results.items():
+        for metric, value in metrics.items():
+            if name not in before_results or metric not in before_results[name]:
+                continue
+            old = before_results[name][metric]
+            change = (value - old) / old if old else 0.0
+            worse = -change if HIGHER_IS_BETTER[metric] else change
+            flag = ""
+            if worse > threshold:
+                flag = "REGRESSION"
+                regressions += 1
+            print("{0:<16} {1:<16} {2:>12.6g} {3:>12.6g} {4:>+7.1%} {5}".format(name, metric, old, value, change, flag))
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mx340_interface benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run benchmarks")
+    run_parser.add_argument("--output", "-o", help="write results to this JSON file")
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("before")
+    compare_parser.add_argument("after")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        sys.exit(run(args.output))
+    else:
+        sys.exit(compare(args.before, args.after, args.threshold))
@@ -0,0 +1,207 @@
+# Simulated NEC K13988 control panel chip, as seen from the UART.
+#
+# Decodes the command stream sent by mx340_interface's K13988 class, keeps
+# a model of LCD controller RAM so the resulting screen can be compared
+# against the frame buffer, reports key matrix scan codes and counts bytes
+# on the wire.
+#
+# LCD commands arrive as the second byte of 0x04 frames, least-significant
+# bit first. Decoded they follow the ST7565-style command set: 0xB0+n sets
+# page n, 0x1h + 0x0l set the column address to 0xhl. A 0x06 frame announces
+# a bulk write of the given number of bytes into RAM at the current page and
+# column, with the column advancing after each byte.
+#
+# Timing comes from the busio stand-in, which models line time of the
+# 250000 baud 8E2 link in both directions. The chip adds ack_delay between
+# receiving a frame and starting to send its ACK, and sends a key matrix
+# scan report every report_interval seconds while enabled.
+
+import asyncio
+
+import mx340 # Puts CircuitPython stand-ins on sys.path
+import busio
+import digitalio
+
+ACK = 0x20
+NO_KEY = 0x80
+
+# Until initialization reaches this command, scan reports are followed by 0x40
+INIT_SHORT_REPORT = b'\x04\x34'
+
+LCD_COLUMN_OFFSET = 0x3C
+LCD_WIDTH = 196
+LCD_PAGES = (2, 3, 4, 5, 6)
+
+def bit_reverse(value):
+    result = 0
+    for _ in range(8):
+        result = (result << 1) | (value & 1)
+        value >>= 1
+    return result
+
+class K13988Model:
+    # ack_delay is seconds between receiving a frame and starting its ACK
+    def __init__(self, ack_delay=0.0, report_interval=0.01):
+        self.uart = None
+        self.ack_delay = ack_delay
+        self.report_interval = report_interval
+        self.enabled = False
+        self._report_handle = None
+        self.key = NO_KEY
+        self._short_reports = False
+
+        # Time of most recent change in key pressed, see press()
+        self.key_change_time = None
+
+        self._reset()
+
+        # Wire statistics
+        self.bytes_received = 0
+        self.frames_received = 0
+        self.bulk_bytes_received = 0
+        self.reports_sent = 0
+
+        # Simulated time of every bulk write into LCD RAM
+        self.lcd_write_times = []
+        # Seconds from a frame starting on the wire to its ACK arriving
+        self.ack_round_trips = []
+
+        # If set, called with every frame sent to the chip. When it returns
+        # True the frame is lost on the wire, so it is neither processed nor
+        # acknowledged.
+        self.lose_frame = None
+
+    def _reset(self):
+        # LCD controller state
+        self.lcd_ram = [bytearray(256) for _ in range(8)]
+        self.lcd_page = 0
+        self.lcd_column = 0
+        self.lcd_commands = []
+
+        # Last value written to each non-LCD register, by command byte
+        self.registers = {}
+
+        # Remaining byte count of bulk transfer in progress
+        self._bulk_remaining = 0
+        self._short_reports = False
+
+    # Connect to the busio.UART the device code will create on tx_pin, and
+    # to the digital output driving the chip's enable line.
+    def connect(self, tx_pin, enable_pin=None):
+        busio.connect(tx_pin, self)
+        if enable_pin is None:
+            self.enabled = True
+        else:
+            digitalio.listen(enable_pin, self._enable_changed)
+
+    def uart_attach(self, uart):
+        self.uart = uart
+        if self.enabled:
+            self._start_reports()
+
+    def _enable_changed(self, value):
+        if value == self.enabled:
+            return
+        self.enabled = value
+        if value:
+            self._reset()
+            self._start_reports()
+        elif self._report_handle is not None:
+            self._report_handle.cancel()
+            self._report_handle = None
+
+    def _start_reports(self):
+        if self.uart is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop, send one report so device code sees the chip
+            self.uart.send(bytes((self.key, 0x40)))
+            return
+        self._report_handle = loop.call_later(self.report_interval, self._report)
+
+    def _report(self):
+        if self._short_reports:
+            self.uart.send(bytes((self.key,)))
+        else:
+            self.uart.send(bytes((self.key, 0x40)))
+        self.reports_sent += 1
+        self._report_handle = asyncio.get_running_loop().call_later(self.report_interval, self._report)
+
+    # Change key reported by key matrix scan. NO_KEY for release.
+    def press(self, keycode):
+        self.key = keycode
+        try:
+            self.key_change_time = asyncio.get_running_loop().time()
+        except RuntimeError:
+            self.key_change_time = None
+
+    def release(self):
+        self.press(NO_KEY)
+
+    def uart_write(self, uart, data):
+        if not self.enabled:
+            return
+        if self.lose_frame is not None and self.lose_frame(data):
+            return
+        self.receive(data)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            uart.send(bytes((ACK,)))
+            return
+        # Timed from when the frame ended, even if delivered late
+        ack_time = uart.frame_end + self.ack_delay
+        if ack_time > loop.time():
+            loop.call_at(ack_time, self._ack, uart, len(data), ack_time)
+        else:
+            self._ack(uart, len(data), ack_time)
+
+    def _ack(self, uart, frame_length, ack_time):
+        arrival = uart.send(bytes((ACK,)), ack_time)
+        start = ack_time - self.ack_delay - frame_length * uart.byte_time
+        self.ack_round_trips.append(arrival - start)
+
+    # Process one frame: a 2-byte command or the payload of a bulk write
+    def receive(self, data):
+        self.bytes_received += len(data)
+        self.frames_received += 1
+        if self._bulk_remaining:
+            self._bulk_write(data)
+        elif data[0] == 0x04:
+            self._lcd_command(bit_reverse(data[1]))
+        elif data[0] == 0x06:
+            self._bulk_remaining = data[1]
+        else:
+            self.registers[data[0]] = data[1]
+        if data == INIT_SHORT_REPORT:
+            self._short_reports = True
+
+    def _lcd_command(self, command):
+        self.lcd_commands.append(command)
+        if command & 0xF0 == 0xB0:
+            self.lcd_page = command & 0x0F
+        elif command & 0xF0 == 0x10:
+            self.lcd_column = ((command & 0x0F) << 4) | (self.lcd_column & 0x0F)
+        elif command & 0xF0 == 0x00:
+            self.lcd_column = (self.lcd_column & 0xF0) | command
+
+    def _bulk_write(self, data):
+        page = self.lcd_ram[self.lcd_page]
+        for value in data[:self._bulk_remaining]:
+            page[self.lcd_column & 0xFF] = value
+            self.lcd_column += 1
+        self.bulk_bytes_received += len(data)
+        self._bulk_remaining = max(0, self._bulk_remaining - len(data))
+        try:
+            self.lcd_write_times.append(asyncio.get_running_loop().time())
+        except RuntimeError:
+            pass
+
+    # Screen content in the same stripe layout as K13988's frame buffer
+    def screen_bytes(self):
+        screen = bytearray()
+        for page in LCD_PAGES:
+            screen.extend(self.lcd_ram[page][LCD_COLUMN_OFFSET:LCD_COLUMN_OFFSET + LCD_WIDTH])
+        return bytes(screen)
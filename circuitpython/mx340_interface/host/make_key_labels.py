@@ -0,0 +1,26 @@
+# Pre-render mx340_interface key name labels into a file to copy onto the
+# CIRCUITPY drive, so the device doesn't have to render them at startup.
+#
+#   python make_key_labels.py path/to/font5x8.bin [output]
+#
+# Output defaults to lib/key_labels.bin, copy it to CIRCUITPY/lib/.
+
+import os
+import sys
+
+import mx340
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python make_key_labels.py path/to/font5x8.bin [output]")
+        sys.exit(1)
+    font_path = os.path.abspath(sys.argv[1])
+    output = os.path.abspath(sys.argv[2]) if len(sys.argv) == 3 else None
+
+    module = mx340.load()
+    if output is None:
+        output = mx340.module_path(module.key_label_file)
+    module.key_label_font = font_path
+    labels = module.render_key_labels()
+    module.save_key_labels(labels, output)
+    print("Wrote {0} labels, {1} bytes, to {2}".format(module.key_label_count(labels), module.key_labels_size(labels) + 1, output))
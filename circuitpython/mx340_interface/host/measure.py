@@ -0,0 +1,500 @@
+# Measurements of mx340_interface K13988 behavior against simulated hardware,
+# run in virtual time (see virtual_time.py) so results don't depend on the
+# speed of the desktop running them.
+#
+#   python measure.py refresh-bytes
+#   python measure.py pipeline
+#   python measure.py idle
+#   python measure.py latency
+#   python measure.py priority
+#   python measure.py registers
+#   python measure.py panels
+#   python measure.py display
+#   python measure.py inputs
+#   python measure.py retries
+#
+# Run from this directory.
+
+import asyncio
+import sys
+
+import mx340 # Puts CircuitPython stand-ins on sys.path
+import keypad
+import input_events
+import k13988_panels
+import virtual_time
+from k13988_sim import K13988Model
+
+# Key presses typed during measurements. Each is followed by its release.
+KEY_SEQUENCE = ("ONE", "TWO", "THREE", "OK", "MENU", "FAX_QUALITY", "LEFT", "RIGHT", "COPY", "HOOK")
+
+# Assumed time for K13988 to start sending an ACK after receiving a frame
+ACK_DELAY = 0.0002
+
+# K13988 wired to a simulated chip the way main() expects it
+def connect_panel(module, model):
+    model.connect(module.board.GP0, module.board.GP2)
+    return module.K13988(module.board.GP0, module.board.GP1, module.board.GP2)
+
+def _mean(values):
+    return sum(values) / len(values)
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def _refresh_bytes(module):
+    model = K13988Model(ACK_DELAY)
+    async with connect_panel(module, model) as k13988:
+        framebuffer = module.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+        await module.write_keycode_string(k13988, framebuffer, module.Keycode.NONE)
+
+        refreshes = 0
+        sent = model.bytes_received
+        for key_name in KEY_SEQUENCE:
+            for key_number in (getattr(module.Keycode, key_name), module.Keycode.NONE):
+                await module.write_keycode_string(k13988, framebuffer, key_number)
+                assert model.screen_bytes() == k13988.get_frame_buffer_bytearray(), "LCD does not match frame buffer"
+                refreshes += 1
+        return refreshes, model.bytes_received - sent, k13988.get_refresh_bytes_saved()
+
+def refresh_bytes():
+    full = 5 * (4*2 + 196)
+    print("{0:<22} {1:>9} {2:>12} {3:>8}".format("mode", "refreshes", "bytes/refresh", "saved"))
+    for partial in (False, True):
+        module = mx340.load()
+        module.lcd_partial_stripe_update = partial
+        refreshes, sent, saved = virtual_time.run(_refresh_bytes(module))
+        mode = "dirty columns" if partial else "dirty stripes"
+        print("{0:<22} {1:>9} {2:>12.1f} {3:>7.1%}".format(mode, refreshes, sent / refreshes, 1 - sent / (refreshes * full)))
+    print("{0:<22} {1:>9} {2:>12.1f}".format("full refresh", "", full))
+
+# Full screen refreshes, alternating all pixels on and off
+async def _pipeline(module, ack_delay, refreshes):
+    loop = asyncio.get_running_loop()
+    model = K13988Model(ack_delay)
+    async with connect_panel(module, model) as k13988:
+        framebuffer = module.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+        frames = model.frames_received
+        start = loop.time()
+        for count in range(refreshes):
+            framebuffer.fill(count & 1 == 0)
+            await k13988.refresh()
+        elapsed = loop.time() - start
+        assert model.screen_bytes() == k13988.get_frame_buffer_bytearray(), "LCD does not match frame buffer"
+
+        led_start = loop.time()
+        await k13988.in_use_led(True)
+        led_latency = loop.time() - led_start
+        return elapsed / refreshes, (model.frames_received - frames) / elapsed, led_latency
+
+def pipeline(ack_delay=ACK_DELAY, refreshes=20):
+    print("Simulated ACK delay {0:.1f}ms".format(ack_delay * 1000))
+    print("{0:>6} {1:>12} {2:>12} {3:>14}".format("window", "refresh ms", "commands/s", "LED command ms"))
+    for window in (1, 2, 4, 8):
+        module = mx340.load()
+        module.uart_tx_window = window
+        latency, throughput, led_latency = virtual_time.run(_pipeline(module, ack_delay, refreshes))
+        print("{0:>6} {1:>12.2f} {2:>12.0f} {3:>14.2f}".format(window, latency * 1000, throughput, led_latency * 1000))
+
+async def _idle(module, duration, blink):
+    loop = asyncio.get_running_loop()
+    model = K13988Model(ACK_DELAY)
+    async with connect_panel(module, model) as k13988:
+        if blink:
+            blinkers = [asyncio.create_task(module.inuse_blinker(k13988)), asyncio.create_task(module.wifi_blinker(k13988))]
+        iterations = loop.iterations
+        idle_time = loop.idle_time
+        polls = k13988.get_receiver_poll_count()
+        start = loop.time()
+        await asyncio.sleep(duration)
+        elapsed = loop.time() - start
+        if blink:
+            for blinker in blinkers:
+                blinker.cancel()
+        return ((loop.iterations - iterations) / elapsed,
+            (k13988.get_receiver_poll_count() - polls) / elapsed,
+            1 - (loop.idle_time - idle_time) / elapsed)
+
+def idle(duration=2.0):
+    print("{0:<34} {1:>14} {2:>10} {3:>6}".format("", "iterations/s", "polls/s", "busy"))
+    for blink in (False, True):
+        for interval in (0, None):
+            module = mx340.load()
+            if interval is not None:
+                module.uart_rx_poll_interval = interval
+            iterations, polls, busy = virtual_time.run(_idle(module, duration, blink))
+            label = "{0}, poll {1}".format("LED blinkers" if blink else "idle",
+                "every pass" if interval == 0 else "every {0}ms".format(module.uart_rx_poll_interval * 1000))
+            print("{0:<34} {1:>14.0f} {2:>10.0f} {3:>6.1%}".format(label, iterations, polls, busy))
+
+# Time from a key changing on the panel to the last LCD write it caused
+async def _key_to_screen(module, model, key_number, settle=0.2):
+    model.press(key_number)
+    await asyncio.sleep(settle)
+    writes = [t for t in model.lcd_write_times if t > model.key_change_time]
+    return writes[-1] - model.key_change_time if writes else None
+
+async def _latency(module):
+    loop = asyncio.get_running_loop()
+    model = K13988Model(ACK_DELAY)
+    async with connect_panel(module, model) as k13988:
+        printer = asyncio.create_task(module.printkeys(k13988))
+        blinkers = [asyncio.create_task(module.inuse_blinker(k13988)), asyncio.create_task(module.wifi_blinker(k13988))]
+        await asyncio.sleep(0.5)
+
+        key_to_screen = []
+        for key_name in KEY_SEQUENCE:
+            for key_number in (getattr(module.Keycode, key_name), module.Keycode.NONE):
+                latency = await _key_to_screen(module, model, key_number)
+                if latency is not None:
+                    key_to_screen.append(latency)
+
+        for task in [printer] + blinkers:
+            task.cancel()
+
+        framebuffer = module.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+        refresh = []
+        for count in range(10):
+            framebuffer.fill(count & 1 == 0)
+            start = loop.time()
+            await k13988.refresh()
+            refresh.append(loop.time() - start)
+
+        return model.ack_round_trips, refresh, key_to_screen
+
+def latency():
+    module = mx340.load()
+    ack_round_trips, refresh, key_to_screen = virtual_time.run(_latency(module))
+    print("{0:<28} {1:>8} {2:>8} {3:>8} {4:>8}".format("ms", "samples", "mean", "p50", "p95"))
+    for label, values in (("ACK round trip", ack_round_trips), ("full refresh", refresh), ("key to screen", key_to_screen)):
+        print("{0:<28} {1:>8} {2:>8.2f} {3:>8.2f} {4:>8.2f}".format(label, len(values),
+            _mean(values) * 1000, _percentile(values, 0.5) * 1000, _percentile(values, 0.95) * 1000))
+
+# LED commands sent while full screen refreshes run back to back, and
+# refreshes requested faster than they can be sent
+async def _priority(module, refreshes=20):
+    loop = asyncio.get_running_loop()
+    model = K13988Model(ACK_DELAY)
+    async with connect_panel(module, model) as k13988:
+        framebuffer = module.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+
+        async def refresher():
+            for count in range(refreshes):
+                framebuffer.fill(count & 1 == 0)
+                await k13988.refresh()
+        refresh_task = asyncio.create_task(refresher())
+        led_latency = []
+        while not refresh_task.done():
+            start = loop.time()
+            await k13988.in_use_led(len(led_latency) & 1 == 0)
+            led_latency.append(loop.time() - start)
+            await asyncio.sleep(0.013)
+        wait_stats = k13988.get_transmit_wait_stats()
+
+        # Queue a refresh per frame without waiting, as an animation would
+        sent = model.bytes_received
+        for count in range(refreshes):
+            framebuffer.fill_rect(count * 9, 0, 9, 40, 1)
+            await k13988.refresh(wait=False)
+            await asyncio.sleep(0.002)
+        await k13988.refresh()
+        assert model.screen_bytes() == k13988.get_frame_buffer_bytearray(), "LCD does not match frame buffer"
+        return led_latency, wait_stats, k13988.get_refresh_merge_count(), model.bytes_received - sent
+
+def priority():
+    module = mx340.load()
+    led_latency, wait_stats, merged, sent = virtual_time.run(_priority(module))
+    print("{0:<28} {1:>8} {2:>8} {3:>8} {4:>8}".format("ms", "samples", "mean", "p50", "p95"))
+    print("{0:<28} {1:>8} {2:>8.2f} {3:>8.2f} {4:>8.2f}".format("LED command during refresh", len(led_latency),
+        _mean(led_latency) * 1000, _percentile(led_latency, 0.5) * 1000, _percentile(led_latency, 0.95) * 1000))
+    print()
+    print("{0:<28} {1:>8} {2:>8} {3:>8}".format("queue wait ms", "commands", "mean", "max"))
+    for label, (count, total, longest) in zip(("control", "LCD"), wait_stats):
+        print("{0:<28} {1:>8} {2:>8.2f} {3:>8}".format(label, count, total / count if count else 0, longest))
+    print()
+    print("Refreshes queued without waiting: {0} stripe uploads merged, {1} bytes sent".format(merged, sent))
+
+# Register writes over a stretch of the main() workload, typing keys
+async def _registers(module, duration=10.0, key_interval=0.15):
+    model = K13988Model(ACK_DELAY)
+    async with connect_panel(module, model) as k13988:
+        inputs = await input_events.InputEvents(k13988, module.direct_wired_keys(), module.direct_wired_poll_interval).__aenter__()
+        tasks = [asyncio.create_task(task) for task in (
+            module.inuse_blinker(k13988),
+            module.wifi_blinker(k13988),
+            module.direct_wired(inputs),
+            module.printkeys(k13988))]
+        await asyncio.sleep(0.5)
+        writes = k13988.get_register_write_stats()
+        loop = asyncio.get_running_loop()
+        end = loop.time() + duration
+        key_names = KEY_SEQUENCE
+        count = 0
+        while loop.time() < end:
+            key_number = getattr(module.Keycode, key_names[count % len(key_names)]) if count & 1 == 0 else module.Keycode.NONE
+            model.press(key_number)
+            count += 1
+            await asyncio.sleep(key_interval)
+        for task in tasks:
+            task.cancel()
+        await inputs.__aexit__(None, None, None)
+        return tuple(after - before for after, before in zip(k13988.get_register_write_stats(), writes))
+
+def registers(duration=10.0):
+    module = mx340.load()
+    requested, dropped, merged = virtual_time.run(_registers(module, duration))
+    print("Register writes in {0:.0f}s of main() workload with typing".format(duration))
+    print("{0:<10} {1:>8} {2:>8} {3:>8} {4:>12}".format("requested", "sent", "dropped", "merged", "bytes saved"))
+    print("{0:<10} {1:>8} {2:>8} {3:>8} {4:>12}".format(requested, requested - dropped - merged, dropped, merged, 2 * (dropped + merged)))
+
+# Pins of panel number index, three GP pins each
+def panel_pins(module, index):
+    return tuple(getattr(module.board, "GP{0}".format(index * 3 + offset)) for offset in range(3))
+
+# Several panels either as one K13988_Panels, or as K13988 instances each with
+# their own receiver task
+async def _panels(module, count, shared, duration=1.0):
+    loop = asyncio.get_running_loop()
+    models = [K13988Model(ACK_DELAY) for _ in range(count)]
+    pins = [panel_pins(module, index) for index in range(count)]
+    for model, (tx_pin, rx_pin, enable_pin) in zip(models, pins):
+        model.connect(tx_pin, enable_pin)
+    if shared:
+        manager = k13988_panels.K13988_Panels(module.K13988, pins, module.uart_rx_poll_interval)
+        panels = manager.panels
+    else:
+        panels = [module.K13988(*panel) for panel in pins]
+    for panel in panels:
+        panel._rx_poll_count = 0
+
+    if shared:
+        await manager.__aenter__()
+    else:
+        await asyncio.gather(*(panel.__aenter__() for panel in panels))
+    try:
+        # Idle
+        iterations = loop.iterations
+        idle_time = loop.idle_time
+        start = loop.time()
+        await asyncio.sleep(duration)
+        busy = 1 - (loop.idle_time - idle_time) / (loop.time() - start)
+
+        # Every panel refreshing full screens as fast as it can
+        refreshes = [0] * count
+        async def refresher(index):
+            framebuffer = module.K13988_FrameBuffer(panels[index].get_frame_buffer_bytearray())
+            while loop.time() < end:
+                framebuffer.fill(refreshes[index] & 1 == 0)
+                await panels[index].refresh()
+                refreshes[index] += 1
+        start = loop.time()
+        end = start + duration
+        await asyncio.gather(*(refresher(index) for index in range(count)))
+        refresh_rate = sum(refreshes) / (loop.time() - start)
+
+        # Press and release a key on each panel in turn
+        key_latency = []
+        for repeat in range(5):
+            for index in range(count):
+                for key_number in (module.Keycode.OK, module.Keycode.NONE):
+                    models[index].press(key_number)
+                    pressed = loop.time()
+                    if shared:
+                        event = await manager.next_key_event()
+                        assert event.panel == index
+                    else:
+                        await panels[index].next_key_event()
+                    key_latency.append(loop.time() - pressed)
+                    await asyncio.sleep(0.003 * repeat)
+        for model in models:
+            assert model.screen_bytes() == bytes(196*5) or model.screen_bytes() == bytes([0xFF])*196*5
+    finally:
+        if shared:
+            await manager.__aexit__(None, None, None)
+        else:
+            for panel in panels:
+                await panel.__aexit__(None, None, None)
+    return refresh_rate, min(refreshes), max(refreshes), _mean(key_latency), busy
+
+def panels():
+    print("{0:<24} {1:>12} {2:>16} {3:>10} {4:>10}".format("", "refreshes/s", "per panel min-max", "key ms", "idle busy"))
+    for count in (1, 2, 4, 8):
+        for shared in (False, True):
+            module = mx340.load()
+            refresh_rate, fewest, most, key_latency, busy = virtual_time.run(_panels(module, count, shared))
+            label = "{0} panel{1}, {2}".format(count, "s" if count > 1 else "", "K13988_Panels" if shared else "separate")
+            print("{0:<24} {1:>12.1f} {2:>16} {3:>10.2f} {4:>10.1%}".format(label, refresh_rate, "{0}-{1}".format(fewest, most), key_latency * 1000, busy))
+
+# Fast typing, one key change per key_interval, shown by printkeys() through
+# the display task, or if interval is None by awaiting refresh() per event
+async def _display(module, interval, key_changes, key_interval):
+    model = K13988Model(ACK_DELAY)
+    async with connect_panel(module, model) as k13988:
+        if interval is None:
+            async def printer():
+                framebuffer = module.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+                labels = module.render_key_labels()
+                key = module.KeyEvent()
+                while True:
+                    await k13988.next_key_event(key)
+                    await module.write_key_label(k13988, framebuffer, labels, key.key_number if key.pressed else module.Keycode.NONE)
+            printer_task = asyncio.create_task(printer())
+        else:
+            printer_task = asyncio.create_task(module.printkeys(k13988))
+        await asyncio.sleep(0.5)
+        sent = model.bytes_received
+        frames, dropped, _, _, _ = k13988.get_display_stats()
+
+        for count in range(key_changes):
+            if count & 1:
+                model.release()
+            else:
+                model.press(getattr(module.Keycode, KEY_SEQUENCE[count // 2 % len(KEY_SEQUENCE)]))
+            await asyncio.sleep(key_interval)
+        last_change = model.key_change_time
+        # Awaiting refresh() per event may still be working through queued
+        # key events, give it up to 10s to catch up
+        await asyncio.sleep(1.0)
+        for _ in range(90):
+            if model.screen_bytes() == k13988.get_frame_buffer_bytearray() and not k13988.get_commands_in_flight():
+                break
+            await asyncio.sleep(0.1)
+        printer_task.cancel()
+        assert model.screen_bytes() == k13988.get_frame_buffer_bytearray(), "LCD does not match frame buffer"
+
+        writes = [t for t in model.lcd_write_times if t > last_change]
+        stats = k13988.get_display_stats()
+        return (stats[0] - frames, stats[1] - dropped, stats[2], stats[3],
+            model.bytes_received - sent, writes[-1] - last_change if writes else None)
+
+def display(key_changes=100, key_interval=0.01):
+    print("{0} key changes every {1:.0f}ms".format(key_changes, key_interval * 1000))
+    print("{0:<22} {1:>7} {2:>8} {3:>6} {4:>20} {5:>8} {6:>12}".format("", "frames", "dropped", "fps", "latency p50/95/99 ms", "bytes", "last key ms"))
+    for interval in (None, 0.0, 0.02, 0.05, 0.1):
+        module = mx340.load()
+        if interval is not None:
+            module.display_refresh_interval = interval
+        frames, dropped, fps, percentiles, sent, last_key = virtual_time.run(_display(module, interval, key_changes, key_interval))
+        if interval is None:
+            label = "refresh() per event"
+            latency = "-"
+        else:
+            label = "display task, {0:.0f}ms".format(interval * 1000)
+            latency = "/".join(str(value) for value in percentiles)
+        # None when the last key change left the screen as it already was
+        last_key = "-" if last_key is None else "{0:.2f}".format(last_key * 1000)
+        print("{0:<22} {1:>7} {2:>8} {3:>6.1f} {4:>20} {5:>8} {6:>12}".format(label, frames, dropped, fps, latency, sent, last_key))
+
+# direct_wired() as it was before InputEvents, checking keypad.Keys on every
+# pass of the scheduler
+async def _polling_direct_wired(module):
+    power_led = module.digitalio.DigitalInOut(module.board.GP4)
+    power_led.switch_to_output(False)
+    keys = module.direct_wired_keys()
+    while True:
+        event = keys.events.get()
+        if event and event.pressed and event.key_number == 0:
+            power_led.value = not power_led.value
+        await asyncio.sleep(0)
+
+# Scheduler time used by direct_wired() waiting for a button, full screen
+# refresh rate alongside it, and button to LED latency
+async def _inputs(module, polling, duration=2.0):
+    loop = asyncio.get_running_loop()
+    model = K13988Model(ACK_DELAY)
+    async with connect_panel(module, model) as k13988:
+        inputs = await input_events.InputEvents(k13988, module.direct_wired_keys(), module.direct_wired_poll_interval).__aenter__()
+        tasks = [asyncio.create_task(_polling_direct_wired(module) if polling else module.direct_wired(inputs))]
+        await asyncio.sleep(0.1)
+
+        idle_time = loop.idle_time
+        start = loop.time()
+        await asyncio.sleep(duration)
+        busy = 1 - (loop.idle_time - idle_time) / (loop.time() - start)
+
+        framebuffer = module.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+        refreshes = 0
+        start = loop.time()
+        while loop.time() < start + duration:
+            framebuffer.fill(refreshes & 1 == 0)
+            await k13988.refresh()
+            refreshes += 1
+        refresh_rate = refreshes / (loop.time() - start)
+
+        led_changes = []
+        module.digitalio.listen(module.board.GP4, lambda value: led_changes.append(loop.time()))
+        button_latency = []
+        for repeat in range(10):
+            keypad.simulate(module.board.GP5, True)
+            pressed = loop.time()
+            changes = len(led_changes)
+            while len(led_changes) == changes:
+                await asyncio.sleep(0.0005)
+            button_latency.append(led_changes[-1] - pressed)
+            keypad.simulate(module.board.GP5, False)
+            await asyncio.sleep(0.0237)
+
+        for task in tasks:
+            task.cancel()
+        await inputs.__aexit__(None, None, None)
+        return busy, refresh_rate, button_latency
+
+def inputs():
+    print("{0:<30} {1:>10} {2:>12} {3:>16}".format("", "idle busy", "refreshes/s", "button to LED ms"))
+    for polling in (True, False):
+        module = mx340.load()
+        busy, refresh_rate, button_latency = virtual_time.run(_inputs(module, polling))
+        label = "polling every pass" if polling else "InputEvents, poll {0:.0f}ms".format(module.direct_wired_poll_interval * 1000)
+        print("{0:<30} {1:>10.1%} {2:>12.1f} {3:>16.2f}".format(label, busy, refresh_rate, _mean(button_latency) * 1000))
+
+# Change columns from start up to end of the top stripe with partial stripe
+# updates on, losing the first LCD data frame sent for them so its ACK never
+# comes. A 1-column window sends a 1-byte frame.
+async def _retries(module, start, end):
+    loop = asyncio.get_running_loop()
+    model = K13988Model(ACK_DELAY)
+    async with connect_panel(module, model) as k13988:
+        framebuffer = module.K13988_FrameBuffer(k13988.get_frame_buffer_bytearray())
+        await k13988.refresh()
+        lost = []
+        def lose_frame(data):
+            if not lost and model._bulk_remaining == end - start:
+                lost.append(data)
+                return True
+            return False
+        model.lose_frame = lose_frame
+        framebuffer.fill_rect(start, 0, end - start, 8, 1)
+        refresh_start = loop.time()
+        await asyncio.wait_for(k13988.refresh(), 5.0)
+        assert lost, "No LCD data frame of {0} bytes sent".format(end - start)
+        assert not k13988.transmitter_task.done(), "Transmitter task ended"
+        assert model.screen_bytes() == k13988.get_frame_buffer_bytearray(), "LCD does not match frame buffer"
+        return loop.time() - refresh_start
+
+def retries():
+    print("{0:<22} {1:>12}".format("lost LCD data frame", "refresh ms"))
+    for start, end in ((100, 101), (100, 102), (0, 196)):
+        module = mx340.load()
+        module.lcd_partial_stripe_update = True
+        duration = virtual_time.run(_retries(module, start, end))
+        print("{0:<22} {1:>12.2f}".format("{0} column{1}".format(end - start, "s" if end - start > 1 else ""), duration * 1000))
+
+MEASUREMENTS = {
+    "refresh-bytes": refresh_bytes,
+    "pipeline": pipeline,
+    "idle": idle,
+    "latency": latency,
+    "priority": priority,
+    "registers": registers,
+    "panels": panels,
+    "display": display,
+    "inputs": inputs,
+    "retries": retries,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in MEASUREMENTS:
+        print("Usage: python measure.py [{0}]".format("|".join(MEASUREMENTS)))
+        sys.exit(1)
+    MEASUREMENTS[sys.argv[1]]()
@@ -0,0 +1,132 @@
+# NumPy conversion between images and the MVMSB frame buffer layout of
+# mx340_interface's K13988: 5 stripes of 196 bytes, each byte a column of 8
+# pixels with the top one in the most significant bit. Images are boolean
+# arrays of 34 rows by 196 columns. Every function also takes a stack of
+# frames or images along leading axes, and works on all of them at once.
+#
+# Unlike the rest of this directory this needs NumPy. Run this file to check
+# results against MVMSBFormat and K13988 in code.py on random images:
+#
+#   python mvmsb_numpy.py [count]
+
+import sys
+
+import numpy as np
+
+WIDTH = 196
+HEIGHT = 34
+STRIPES = 5
+FRAME_BYTES = STRIPES * WIDTH
+
+def _frames(frames):
+    frames = np.asarray(frames, dtype=np.uint8)
+    if frames.shape[-1:] != (FRAME_BYTES,):
+        raise ValueError("Frames must have {0} bytes, got shape {1}".format(FRAME_BYTES, frames.shape))
+    return frames
+
+# Frame buffer bytes of images, shape (..., 980) uint8. Bits of rows 34 to 39,
+# past the bottom of the screen, are 0.
+def to_frames(images):
+    images = np.asarray(images, dtype=bool)
+    if images.shape[-2:] != (HEIGHT, WIDTH):
+        raise ValueError("Images must be {0}x{1}, got shape {2}".format(HEIGHT, WIDTH, images.shape))
+    lead = images.shape[:-2]
+    padded = np.zeros(lead + (STRIPES * 8, WIDTH), dtype=bool)
+    padded[..., :HEIGHT, :] = images
+    packed = np.packbits(padded.reshape(lead + (STRIPES, 8, WIDTH)), axis=-2, bitorder="big")
+    return packed.reshape(lead + (FRAME_BYTES,))
+
+# Images of frame buffer bytes, shape (..., 34, 196) bool
+def to_images(frames):
+    frames = _frames(frames)
+    lead = frames.shape[:-1]
+    bits = np.unpackbits(frames.reshape(lead + (STRIPES, 1, WIDTH)), axis=-2, bitorder="big")
+    return bits.reshape(lead + (STRIPES * 8, WIDTH))[..., :HEIGHT, :].astype(bool)
+
+# Frames showing foreground where mask frames have pixels set, and background
+# elsewhere. Arguments broadcast, e.g. one background under many foregrounds.
+def composite(background, foreground, mask):
+    background = _frames(background)
+    foreground = _frames(foreground)
+    mask = _frames(mask)
+    return (background & ~mask) | (foreground & mask)
+
+# Frame with every pixel set in any of frames along axis
+def union(frames, axis=0):
+    return np.bitwise_or.reduce(_frames(frames), axis=axis)
+
+# Bytes that differ between frames, set bits are changed pixels
+def diff(before, after):
+    return _frames(before) ^ _frames(after)
+
+# Number of changed pixels in each frame, shape (...)
+def changed_pixels(before, after):
+    return np.unpackbits(diff(before, after), axis=-1).sum(axis=-1)
+
+# Whether each stripe changed, shape (..., 5) bool
+def dirty_stripes(before, after):
+    delta = diff(before, after)
+    return delta.reshape(delta.shape[:-1] + (STRIPES, WIDTH)).any(axis=-1)
+
+# Start and end (exclusive) column of the changed part of each stripe, as
+# K13988.refresh() sends them, shape (..., 5) each. Both are 0 for a stripe
+# without changes.
+def dirty_columns(before, after):
+    delta = diff(before, after)
+    changed = delta.reshape(delta.shape[:-1] + (STRIPES, WIDTH)) != 0
+    dirty = changed.any(axis=-1)
+    start = np.where(dirty, changed.argmax(axis=-1), 0)
+    end = np.where(dirty, WIDTH - changed[..., ::-1].argmax(axis=-1), 0)
+    return start, end
+
+# Compare against code.py on count random images of varied density
+def _self_check(count):
+    import mx340
+    module = mx340.load()
+    rng = np.random.default_rng(340)
+    images = rng.random((count, HEIGHT, WIDTH)) < rng.random((count, 1, 1))
+    frames = to_frames(images)
+
+    framebuffer = module.K13988_FrameBuffer(bytearray(FRAME_BYTES))
+    for image, frame in zip(images, frames):
+        framebuffer.fill(0)
+        for y, x in zip(*np.nonzero(image)):
+            module.MVMSBFormat.set_pixel(framebuffer, int(x), int(y), 1)
+        assert bytes(framebuffer.buf) == frame.tobytes(), "to_frames differs from MVMSBFormat.set_pixel"
+
+    # Frames with every byte random, including rows past the bottom
+    random_frames = rng.integers(0, 256, (count, FRAME_BYTES), dtype=np.uint8)
+    decoded = to_images(random_frames)
+    for image, frame in zip(decoded, random_frames):
+        framebuffer.buf[:] = frame.tobytes()
+        for y in range(HEIGHT):
+            for x in range(WIDTH):
+                assert bool(module.MVMSBFormat.get_pixel(framebuffer, x, y)) == image[y, x], "to_images differs from MVMSBFormat.get_pixel"
+    # Last stripe shows only rows 32 and 33
+    visible = np.repeat(np.array([0xFF, 0xFF, 0xFF, 0xFF, 0xC0], dtype=np.uint8), WIDTH)
+    assert (to_frames(decoded) == random_frames & visible).all(), "to_frames(to_images()) is not identity"
+
+    backgrounds = to_frames(rng.random((count, HEIGHT, WIDTH)) < 0.5)
+    masks_images = rng.random((count, HEIGHT, WIDTH)) < 0.3
+    result = to_images(composite(backgrounds, frames, to_frames(masks_images)))
+    assert (result == np.where(masks_images, images, to_images(backgrounds))).all(), "composite differs per pixel"
+    assert (to_images(union(frames)) == images.any(axis=0)).all(), "union differs per pixel"
+    assert (changed_pixels(backgrounds, frames) == (to_images(backgrounds) != images).sum(axis=(-2, -1))).all(), "changed_pixels differs"
+
+    # Dirty stripes and columns as K13988 finds them
+    k13988 = module.K13988(module.board.GP0, module.board.GP1, module.board.GP2)
+    k13988._lcd_content_valid = True
+    start, end = dirty_columns(backgrounds, frames)
+    stripes = dirty_stripes(backgrounds, frames)
+    for index in range(count):
+        k13988._lcd_bytearray[:] = backgrounds[index].tobytes()
+        k13988.get_frame_buffer_bytearray()[:] = frames[index].tobytes()
+        k13988._lcd_update_transmit_buffer()
+        for stripe in range(STRIPES):
+            window = (k13988._lcd_windows[stripe * 2], k13988._lcd_windows[stripe * 2 + 1])
+            assert window == (start[index, stripe], end[index, stripe]), "dirty_columns differs from K13988"
+            assert (window[1] != 0) == stripes[index, stripe], "dirty_stripes differs from K13988"
+    print("{0} random images and frames match code.py".format(count))
+
+if __name__ == "__main__":
+    _self_check(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
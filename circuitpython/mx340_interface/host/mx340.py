@@ -0,0 +1,53 @@
+# Load mx340_interface/code.py into a desktop CPython process, with the
+# CircuitPython modules it imports replaced by the stand-ins in shims/, and
+# modules from circuitpython/lib importable as they are from lib/ on the device.
+# The device code is loaded unmodified. main() does not run because the
+# module is not loaded as __main__.
+#
+# This directory stands in for the root of the CIRCUITPY drive, and is made
+# the working directory so relative paths like lib/font5x8.bin resolve.
+# Font files are not part of this repository. If lib/font5x8.bin is missing,
+# a stand-in 5x8 font is written there. Its glyphs are not legible, but text
+# drawn with it takes the same work as with the real one.
+
+import importlib.util
+import os
+import sys
+
+HOST_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SHIM_DIRECTORY = os.path.join(HOST_DIRECTORY, "shims")
+CODE_PATH = os.path.join(os.path.dirname(HOST_DIRECTORY), "code.py")
+
+# Modules copied to lib/ on the CIRCUITPY drive
+LIB_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(HOST_DIRECTORY)), "lib")
+
+for directory in (LIB_DIRECTORY, SHIM_DIRECTORY):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+
+FONT_PATH = os.path.join(HOST_DIRECTORY, "lib", "font5x8.bin")
+
+def _write_stand_in_font():
+    data = bytearray(b'\x05\x08')
+    for char in range(256):
+        for column in range(5):
+            if 0x20 < char < 0x7F:
+                data.append(((char * 37) ^ (column * 91) ^ (char >> 2)) & 0x7F)
+            else:
+                data.append(0)
+    os.makedirs(os.path.dirname(FONT_PATH), exist_ok=True)
+    with open(FONT_PATH, "wb") as font_file:
+        font_file.write(data)
+
+# Host path of a path relative to CIRCUITPY drive root
+def module_path(path):
+    return os.path.join(HOST_DIRECTORY, path)
+
+def load(name="mx340_interface"):
+    os.chdir(HOST_DIRECTORY)
+    if not os.path.exists(FONT_PATH):
+        _write_stand_in_font()
+    spec = importlib.util.spec_from_file_location(name, CODE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
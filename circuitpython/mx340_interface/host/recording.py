@@ -0,0 +1,78 @@
+# Record a simulated key session of mx340_interface, and replay recordings
+# against the simulated K13988.
+#
+#   python recording.py record session.k13r
+#   python recording.py replay session.k13r [--speed 1.0]
+#
+# record types measure.KEY_SEQUENCE with printkeys() running, and reports
+# recording size against the raw 980 bytes of each frame. replay plays a
+# recording with play_recording(), speed 0 for as fast as the panel accepts
+# frames, then checks the screen shows its last frame.
+
+import argparse
+import asyncio
+import sys
+
+import measure
+import mx340 # Puts CircuitPython stand-ins and lib modules on sys.path
+import k13988_recording
+import virtual_time
+from k13988_sim import K13988Model
+
+async def _record(module, output):
+    model = K13988Model(measure.ACK_DELAY)
+    with open(output, "wb") as stream:
+        recorder = k13988_recording.FrameRecorder(stream)
+        async with measure.connect_panel(module, model) as k13988:
+            k13988.set_recorder(recorder)
+            printer = asyncio.create_task(module.printkeys(k13988))
+            await asyncio.sleep(0.5)
+            for key_name in measure.KEY_SEQUENCE:
+                for key_number in (getattr(module.Keycode, key_name), module.Keycode.NONE):
+                    model.press(key_number)
+                    await asyncio.sleep(0.15)
+            printer.cancel()
+    return recorder.frames, recorder.bytes_written
+
+def record(output):
+    module = mx340.load()
+    frames, size = virtual_time.run(_record(module, output))
+    print("Recorded {0} frames in {1} bytes, {2:.1f} bytes per frame, {3:.1%} of raw frames".format(
+        frames, size, size / frames, size / (frames * 196*5)))
+    return 0
+
+async def _replay(module, input_path, speed):
+    loop = asyncio.get_running_loop()
+    model = K13988Model(measure.ACK_DELAY)
+    async with measure.connect_panel(module, model) as k13988:
+        start = loop.time()
+        with open(input_path, "rb") as stream:
+            frames = await k13988_recording.play_recording(k13988, stream, speed)
+        elapsed = loop.time() - start
+        with open(input_path, "rb") as stream:
+            reader = k13988_recording.FrameReader(stream)
+            while reader.read_frame() is not None:
+                pass
+        assert model.screen_bytes() == bytes(reader.frame), "LCD does not match last frame"
+    return frames, elapsed
+
+def replay(input_path, speed):
+    module = mx340.load()
+    frames, elapsed = virtual_time.run(_replay(module, input_path, speed))
+    print("Replayed {0} frames in {1:.3f}s".format(frames, elapsed))
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mx340_interface display recordings")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="record a simulated key session")
+    record_parser.add_argument("output")
+    replay_parser = commands.add_parser("replay", help="replay a recording on the simulated K13988")
+    replay_parser.add_argument("input")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="0 for as fast as possible")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        sys.exit(record(args.output))
+    else:
+        sys.exit(replay(args.input, args.speed))
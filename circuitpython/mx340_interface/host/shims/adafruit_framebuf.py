@@ -0,0 +1,168 @@
+# Host stand-in for adafruit_framebuf, following the library's drawing code
+# closely enough that formats plugged into it see the same calls they would
+# on the device. Scroll, image and the built-in formats are not provided;
+# only the parts used by mx340_interface are.
+#
+# https://github.com/adafruit/Adafruit_CircuitPython_framebuf/blob/main/adafruit_framebuf.py
+
+import struct
+
+MVLSB = 0
+
+class FrameBuffer:
+    def __init__(self, buf, width, height, buf_format=MVLSB, stride=None):
+        # pylint: disable=too-many-arguments
+        self.buf = buf
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self._font = None
+        if self.stride is None:
+            self.stride = width
+        self.format = None
+        self._rotation = 0
+
+    @property
+    def rotation(self):
+        """The rotation setting of the display, can be one of (0, 1, 2, 3)"""
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, val):
+        if not val in (0, 1, 2, 3):
+            raise RuntimeError("Bad rotation setting")
+        self._rotation = val
+
+    def fill(self, color):
+        """Fill the entire FrameBuffer with the specified color."""
+        self.format.fill(self, color)
+
+    def fill_rect(self, x, y, width, height, color):
+        """Draw a rectangle at the given location, size and color. The ``fill_rect`` method draws
+        both the outline and interior."""
+        # pylint: disable=too-many-arguments
+        self.rect(x, y, width, height, color, fill=True)
+
+    def pixel(self, x, y, color=None):
+        """If ``color`` is not given, get the color value of the specified pixel. If ``color`` is
+        given, set the specified pixel to the given color."""
+        if self.rotation == 1:
+            x, y = y, x
+            x = self.width - x - 1
+        if self.rotation == 2:
+            x = self.width - x - 1
+            y = self.height - y - 1
+        if self.rotation == 3:
+            x, y = y, x
+            y = self.height - y - 1
+
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return None
+        if color is None:
+            return self.format.get_pixel(self, x, y)
+        self.format.set_pixel(self, x, y, color)
+        return None
+
+    def hline(self, x, y, width, color):
+        """Draw a horizontal line up to a given length."""
+        self.rect(x, y, width, 1, color, fill=True)
+
+    def vline(self, x, y, height, color):
+        """Draw a vertical line up to a given length."""
+        self.rect(x, y, 1, height, color, fill=True)
+
+    def rect(self, x, y, width, height, color, *, fill=False):
+        """Draw a rectangle at the given location, size and color. The ```rect``` method draws only
+        a 1 pixel outline."""
+        # pylint: disable=too-many-arguments
+        if self.rotation == 1:
+            x, y = y, x
+            width, height = height, width
+            x = self.width - x - width
+        if self.rotation == 2:
+            x = self.width - x - width
+            y = self.height - y - height
+        if self.rotation == 3:
+            x, y = y, x
+            width, height = height, width
+            y = self.height - y - height
+
+        if (
+            width < 1
+            or height < 1
+            or (x + width) <= 0
+            or (y + height) <= 0
+            or y >= self.height
+            or x >= self.width
+        ):
+            return
+        x_end = min(self.width - 1, x + width - 1)
+        y_end = min(self.height - 1, y + height - 1)
+        x = max(x, 0)
+        y = max(y, 0)
+        if fill:
+            self.format.fill_rect(self, x, y, x_end - x + 1, y_end - y + 1, color)
+        else:
+            self.format.fill_rect(self, x, y, x_end - x + 1, 1, color)
+            self.format.fill_rect(self, x, y, 1, y_end - y + 1, color)
+            self.format.fill_rect(self, x, y_end, x_end - x + 1, 1, color)
+            self.format.fill_rect(self, x_end, y, 1, y_end - y + 1, color)
+
+    def text(self, string, x, y, color, *, font_name="font5x8.bin", size=1):
+        """Place text on the screen in variables sizes. Breaks on \\n to next line."""
+        # pylint: disable=too-many-arguments
+        for chunk in string.split("\n"):
+            if not self._font or self._font.font_name != font_name:
+                # load the font!
+                self._font = BitmapFont(font_name)
+            width = self._font.font_width
+            height = self._font.font_height
+            for i, char in enumerate(chunk):
+                char_x = x + (i * (width + 1)) * size
+                if (
+                    char_x + (width * size) > 0
+                    and char_x < self.width
+                    and y + (height * size) > 0
+                    and y < self.height
+                ):
+                    self._font.draw_char(char, char_x, y, self, color, size=size)
+            y += height * size
+
+class BitmapFont:
+    """A helper class to read binary font tiles and 'seek' through them as a
+    file to display in a framebuffer."""
+
+    def __init__(self, font_name="font5x8.bin"):
+        self.font_name = font_name
+        try:
+            with open(font_name, "rb") as font_file:
+                self._font = font_file.read()
+        except OSError:
+            print("Could not find font file", font_name)
+            raise
+        self.font_width, self.font_height = struct.unpack("BB", self._font[:2])
+        if 2 + 256 * self.font_width != len(self._font):
+            raise RuntimeError("Invalid font file: " + font_name)
+
+    def draw_char(self, char, x, y, framebuffer, color, size=1):
+        """Draw one character at position (x,y) to a framebuffer in a given color"""
+        # pylint: disable=too-many-arguments
+        size = max(size, 1)
+        # Don't draw the character if it will be clipped off the visible area.
+        if not 0 <= ord(char) <= 255:
+            return
+        # Go through each column of the character.
+        for char_x in range(self.font_width):
+            # Grab the byte for the current column of font data.
+            line = self._font[2 + (ord(char) * self.font_width) + char_x]
+            # Go through each row in the column byte.
+            for char_y in range(self.font_height):
+                # Draw a pixel for each bit that's flipped on.
+                if (line >> char_y) & 0x1:
+                    framebuffer.fill_rect(
+                        x + char_x * size, y + char_y * size, size, size, color
+                    )
+
+    def width(self, text):
+        """Return the pixel width of the specified text message."""
+        return len(text) * (self.font_width + 1)
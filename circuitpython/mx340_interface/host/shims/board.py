@@ -0,0 +1,11 @@
+# Host stand-in for CircuitPython board module, pin names of a Raspberry Pi Pico
+import microcontroller
+
+for _number in range(29):
+    globals()["GP{0}".format(_number)] = getattr(microcontroller.pin, "GPIO{0}".format(_number))
+
+A0 = GP26
+A1 = GP27
+A2 = GP28
+LED = GP25
+NEOPIXEL = GP16
@@ -0,0 +1,131 @@
+# Host stand-in for CircuitPython busio module. Only UART is provided.
+#
+# A simulated device is connected to the UART that will be created on a given
+# TX pin with connect(). The device receives every write() via its
+# uart_write(uart, data) method and sends data back with uart.send(data).
+#
+# When called from a running event loop, UART line time is modeled: data is
+# delivered once its last bit would have gone over the wire at the configured
+# baud rate and framing, one direction at a time. write() blocks (advancing a
+# virtual clock, if the loop has one) until whatever doesn't fit in the
+# transmit FIFO has been sent.
+#
+# Deliveries scheduled while write() blocks run late, once the event loop
+# gets to them. frame_end holds the time the frame being delivered actually
+# finished, and send() accepts the time the device started replying, so a
+# simulated device keeps to its own timing as real hardware would.
+
+import asyncio
+
+TX_FIFO_SIZE = 32
+
+# Simulated devices by TX pin
+_devices = {}
+
+def connect(tx_pin, device):
+    _devices[tx_pin] = device
+
+class UART:
+    class Parity:
+        ODD = "ODD"
+        EVEN = "EVEN"
+
+    def __init__(self, tx=None, rx=None, *, baudrate=9600, bits=8, parity=None, stop=1, timeout=1, receiver_buffer_size=64):
+        self.baudrate = baudrate
+        self.bits = bits
+        self.parity = parity
+        self.stop = stop
+        self.timeout = timeout
+        self.receiver_buffer_size = receiver_buffer_size
+        self._rx = bytearray()
+        self.rx_overrun = 0
+        self._tx_busy_until = 0.0
+        self._rx_busy_until = 0.0
+        self.frame_end = 0.0
+        self._device = _devices.get(tx)
+        if self._device is not None:
+            self._device.uart_attach(self)
+
+    # Seconds to send one byte: start bit, data bits, parity bit and stop bits
+    @property
+    def byte_time(self):
+        return (1 + self.bits + (1 if self.parity else 0) + self.stop) / self.baudrate
+
+    # Called by simulated device to send bytes to the receive buffer, starting
+    # at time at (default now). Returns time they arrive, or None if delivered
+    # immediately without an event loop.
+    def send(self, data, at=None):
+        loop = _running_loop()
+        if loop is None:
+            self.feed(data)
+            return None
+        start = max(loop.time() if at is None else at, self._rx_busy_until)
+        self._rx_busy_until = start + len(data) * self.byte_time
+        if self._rx_busy_until <= loop.time():
+            self.feed(bytes(data))
+        else:
+            loop.call_at(self._rx_busy_until, self.feed, bytes(data))
+        return self._rx_busy_until
+
+    # Bytes arriving in receive buffer. Like the hardware FIFO, bytes beyond
+    # receiver_buffer_size are lost.
+    def feed(self, data):
+        room = self.receiver_buffer_size - len(self._rx)
+        if len(data) > room:
+            self.rx_overrun += len(data) - room
+            data = data[:room]
+        self._rx.extend(data)
+
+    @property
+    def in_waiting(self):
+        return len(self._rx)
+
+    def read(self, nbytes=None):
+        if not self._rx:
+            return None
+        if nbytes is None or nbytes > len(self._rx):
+            nbytes = len(self._rx)
+        data = bytes(self._rx[:nbytes])
+        del self._rx[:nbytes]
+        return data
+
+    def readinto(self, buf):
+        nbytes = min(len(buf), len(self._rx))
+        if nbytes == 0:
+            return None
+        buf[:nbytes] = self._rx[:nbytes]
+        del self._rx[:nbytes]
+        return nbytes
+
+    def write(self, buf):
+        data = bytes(buf)
+        if self._device is None:
+            return len(data)
+        loop = _running_loop()
+        if loop is None:
+            self._device.uart_write(self, data)
+            return len(data)
+
+        now = loop.time()
+        self._tx_busy_until = max(now, self._tx_busy_until) + len(data) * self.byte_time
+        loop.call_at(self._tx_busy_until, self._deliver, data, self._tx_busy_until)
+        blocked = self._tx_busy_until - now - TX_FIFO_SIZE * self.byte_time
+        if blocked > 0 and hasattr(loop, "advance"):
+            loop.advance(blocked)
+        return len(data)
+
+    def _deliver(self, data, frame_end):
+        self.frame_end = frame_end
+        self._device.uart_write(self, data)
+
+    def reset_input_buffer(self):
+        self._rx = bytearray()
+
+    def deinit(self):
+        self._device = None
+
+def _running_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
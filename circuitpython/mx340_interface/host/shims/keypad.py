@@ -0,0 +1,74 @@
+# Host stand-in for CircuitPython keypad module
+
+class Event:
+    def __init__(self, key_number=0, pressed=True, timestamp=None):
+        self.key_number = key_number
+        self.pressed = pressed
+        self.released = not pressed
+        self.timestamp = timestamp
+
+    def __eq__(self, other):
+        return self.key_number == other.key_number and self.pressed == other.pressed
+
+    def __repr__(self):
+        return "<Event: key_number {0} {1}>".format(self.key_number, "pressed" if self.pressed else "released")
+
+class EventQueue:
+    def __init__(self, max_events=64):
+        self._events = []
+        self._max_events = max_events
+        self.overflowed = False
+
+    def get(self):
+        if self._events:
+            return self._events.pop(0)
+        return None
+
+    def get_into(self, event):
+        if not self._events:
+            return False
+        next_event = self._events.pop(0)
+        event.key_number = next_event.key_number
+        event.pressed = next_event.pressed
+        event.released = next_event.released
+        event.timestamp = next_event.timestamp
+        return True
+
+    def clear(self):
+        self._events = []
+        self.overflowed = False
+
+    def __len__(self):
+        return len(self._events)
+
+    # Host side: queue an event as if the scanner detected it
+    def put(self, event):
+        if len(self._events) >= self._max_events:
+            self.overflowed = True
+        else:
+            self._events.append(event)
+
+# Keys instance and key number by pin, to simulate button presses
+_keys_by_pin = {}
+
+# Host side: simulate button on pin being pressed or released
+def simulate(pin, pressed):
+    keys, key_number = _keys_by_pin[pin]
+    keys.simulate(key_number, pressed)
+
+class Keys:
+    def __init__(self, pins, *, value_when_pressed, pull=True, interval=0.02, max_events=64):
+        self.key_count = len(pins)
+        self.events = EventQueue(max_events)
+        for key_number, pin in enumerate(pins):
+            _keys_by_pin[pin] = (self, key_number)
+
+    # Host side: simulate a button being pressed or released
+    def simulate(self, key_number, pressed):
+        self.events.put(Event(key_number, pressed))
+
+    def reset(self):
+        pass
+
+    def deinit(self):
+        pass
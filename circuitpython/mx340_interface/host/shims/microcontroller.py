@@ -0,0 +1,15 @@
+# Host stand-in for CircuitPython microcontroller module
+
+class Pin:
+    def __init__(self, name):
+        self._name = name
+
+    def __repr__(self):
+        return "microcontroller.pin." + self._name
+
+class _PinNamespace:
+    pass
+
+pin = _PinNamespace()
+for _number in range(30):
+    setattr(pin, "GPIO{0}".format(_number), Pin("GPIO{0}".format(_number)))
@@ -0,0 +1,13 @@
+# Host stand-in for CircuitPython supervisor module. ticks_ms() follows the
+# running event loop's clock, so it counts virtual time under virtual_time.py.
+import asyncio
+import time
+
+_TICKS_PERIOD = 1 << 29
+
+def ticks_ms():
+    try:
+        now = asyncio.get_running_loop().time()
+    except RuntimeError:
+        now = time.monotonic()
+    return int(now * 1000) % _TICKS_PERIOD
@@ -0,0 +1,49 @@
+# asyncio event loop running on a simulated clock, so device code can be
+# timed on the desktop independent of host speed.
+#
+# Whenever no task is ready the clock jumps straight to the next scheduled
+# callback. Every pass through the scheduler costs iteration_cost seconds,
+# standing in for the time a microcontroller spends running the tasks. That
+# keeps code that polls with sleep(0) moving forward in time, and makes the
+# cost of such polling show up in measurements.
+#
+# Simulated hardware may also call advance() to account for blocking
+# operations, such as busio.UART.write() waiting for room in its FIFO.
+
+import asyncio
+
+# Assumed cost of one scheduler pass of CircuitPython asyncio on RP2040
+DEFAULT_ITERATION_COST = 0.00005
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, iteration_cost=DEFAULT_ITERATION_COST):
+        super().__init__()
+        self.iteration_cost = iteration_cost
+        self.iterations = 0
+        # Simulated seconds spent with no task ready to run
+        self.idle_time = 0.0
+        self._now = 0.0
+        self._selector.select = self._select
+
+    def time(self):
+        return self._now
+
+    def advance(self, seconds):
+        self._now += seconds
+
+    def _select(self, timeout=None):
+        if timeout is None:
+            raise RuntimeError("Every task is waiting and nothing is scheduled to wake them")
+        self._now += timeout
+        self.idle_time += timeout
+        return []
+
+    def _run_once(self):
+        self.iterations += 1
+        self._now += self.iteration_cost
+        super()._run_once()
+
+# Run coroutine to completion in virtual time, like asyncio.run()
+def run(coroutine, iteration_cost=DEFAULT_ITERATION_COST):
+    with asyncio.Runner(loop_factory=lambda: VirtualTimeEventLoop(iteration_cost)) as runner:
+        return runner.run(coroutine)
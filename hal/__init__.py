@@ -0,0 +1,31 @@
+# Thin hardware abstraction so one script runs on MicroPython, CircuitPython
+# and desktop Python (against a mock, see _host.py). Each runtime's backend
+# provides the same names:
+#
+#   Pin(pin, output=True, pull_up=False)   GPIO, with value(), on(), off(),
+#                                           toggle() and a toggles count
+#   Pixels(pin, count)                      NeoPixels: pixels[i] = (r, g, b),
+#                                           fill(colour), show()
+#   UART(id, tx, rx, baudrate)              write(data), read(count), any()
+#   ticks_us(), ticks_diff(end, start), ticks_add(ticks, us), sleep_us(us)
+#
+# Pins are GPIO numbers (15 for GP15), or a runtime's own pin object. UART id
+# is the hardware UART number, needed by MicroPython only.
+#
+# Scheduler runs generator tasks cooperatively and measures how late each
+# one runs. See bench.py for a benchmark that runs unchanged on all three.
+#
+# Copy the hal directory to the device: MicroPython root, or lib/ on CIRCUITPY.
+
+import sys
+
+RUNTIME = sys.implementation.name
+
+if RUNTIME == "micropython":
+    from hal._micropython import *
+elif RUNTIME == "circuitpython":
+    from hal._circuitpython import *
+else:
+    from hal._host import *
+
+from hal.scheduler import Scheduler
@@ -0,0 +1,85 @@
+# hal backend for CircuitPython: digitalio, neopixel, busio and time
+
+import busio
+import digitalio
+import microcontroller
+import neopixel
+import time
+
+def _pin(pin):
+    if isinstance(pin, int):
+        return getattr(microcontroller.pin, "GPIO{0}".format(pin))
+    return pin
+
+class Pin:
+    def __init__(self, pin, output=True, pull_up=False):
+        self._io = digitalio.DigitalInOut(_pin(pin))
+        if output:
+            self._io.switch_to_output(False)
+        else:
+            self._io.switch_to_input(digitalio.Pull.UP if pull_up else None)
+        # Number of times output value changed
+        self.toggles = 0
+
+    # Get input value, or set output value
+    def value(self, value=None):
+        if value is None:
+            return 1 if self._io.value else 0
+        value = bool(value)
+        if value != self._io.value:
+            self.toggles += 1
+        self._io.value = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def toggle(self):
+        self._io.value = not self._io.value
+        self.toggles += 1
+
+class Pixels:
+    def __init__(self, pin, count):
+        self._pixels = neopixel.NeoPixel(_pin(pin), count, auto_write=False)
+
+    def __setitem__(self, index, colour):
+        self._pixels[index] = colour
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def fill(self, colour):
+        self._pixels.fill(colour)
+
+    def show(self):
+        self._pixels.show()
+
+class UART:
+    def __init__(self, id, tx, rx, baudrate=115200):
+        self._uart = busio.UART(_pin(tx), _pin(rx), baudrate=baudrate, timeout=0)
+
+    def write(self, data):
+        return self._uart.write(data)
+
+    # Up to count bytes, or None if nothing has arrived
+    def read(self, count):
+        return self._uart.read(count)
+
+    # Number of bytes waiting
+    def any(self):
+        return self._uart.in_waiting
+
+# time.monotonic_ns() doesn't wrap, so neither do these
+def ticks_us():
+    return time.monotonic_ns() // 1000
+
+def ticks_diff(end, start):
+    return end - start
+
+def ticks_add(ticks, us):
+    return ticks + us
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
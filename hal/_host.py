@@ -0,0 +1,95 @@
+# hal backend for desktop Python. Nothing is driven: pins, pixels and UARTs
+# keep their state for scripts and tests to look at, with real time.
+
+import time
+
+class Pin:
+    def __init__(self, pin, output=True, pull_up=False):
+        self.pin = pin
+        self.output = output
+        # Input value, or last output value
+        self.state = 1 if pull_up and not output else 0
+        # Number of times output value changed
+        self.toggles = 0
+
+    # Get input value, or set output value
+    def value(self, value=None):
+        if value is None:
+            return self.state
+        value = 1 if value else 0
+        if value != self.state:
+            self.toggles += 1
+        self.state = value
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def toggle(self):
+        self.state ^= 1
+        self.toggles += 1
+
+class Pixels:
+    def __init__(self, pin, count):
+        self.pin = pin
+        self._pixels = [(0, 0, 0)] * count
+        # Colours as of latest show(), and number of show() calls
+        self.shown = list(self._pixels)
+        self.shows = 0
+
+    def __setitem__(self, index, colour):
+        self._pixels[index] = colour
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def fill(self, colour):
+        self._pixels = [colour] * len(self._pixels)
+
+    def show(self):
+        self.shown = list(self._pixels)
+        self.shows += 1
+
+# Written bytes are kept in sent. Set loopback to receive them as well, or
+# call receive() to have bytes arrive.
+class UART:
+    def __init__(self, id, tx, rx, baudrate=115200, loopback=False):
+        self.loopback = loopback
+        self.sent = bytearray()
+        self._received = bytearray()
+
+    def write(self, data):
+        self.sent.extend(data)
+        if self.loopback:
+            self._received.extend(data)
+        return len(data)
+
+    # Up to count bytes, or None if nothing has arrived
+    def read(self, count):
+        if not self._received:
+            return None
+        data = bytes(self._received[:count])
+        del self._received[:count]
+        return data
+
+    # Number of bytes waiting
+    def any(self):
+        return len(self._received)
+
+    # Host side: bytes arriving from the other end
+    def receive(self, data):
+        self._received.extend(data)
+
+def ticks_us():
+    return time.perf_counter_ns() // 1000
+
+def ticks_diff(end, start):
+    return end - start
+
+def ticks_add(ticks, us):
+    return ticks + us
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
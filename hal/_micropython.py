@@ -0,0 +1,76 @@
+# hal backend for MicroPython: machine, neopixel and time
+
+import machine
+import neopixel
+import time
+
+def _pin(pin, mode, pull=None):
+    if isinstance(pin, int):
+        return machine.Pin(pin, mode, pull)
+    pin.init(mode, pull)
+    return pin
+
+class Pin:
+    def __init__(self, pin, output=True, pull_up=False):
+        if output:
+            self._pin = _pin(pin, machine.Pin.OUT)
+            self._pin.value(0)
+        else:
+            self._pin = _pin(pin, machine.Pin.IN, machine.Pin.PULL_UP if pull_up else None)
+        # Number of times output value changed
+        self.toggles = 0
+
+    # Get input value, or set output value
+    def value(self, value=None):
+        if value is None:
+            return self._pin.value()
+        value = 1 if value else 0
+        if value != self._pin.value():
+            self.toggles += 1
+        self._pin.value(value)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def toggle(self):
+        self._pin.toggle()
+        self.toggles += 1
+
+class Pixels:
+    def __init__(self, pin, count):
+        self._pixels = neopixel.NeoPixel(_pin(pin, machine.Pin.OUT), count)
+
+    def __setitem__(self, index, colour):
+        self._pixels[index] = colour
+
+    def __len__(self):
+        return len(self._pixels)
+
+    def fill(self, colour):
+        self._pixels.fill(colour)
+
+    def show(self):
+        self._pixels.write()
+
+class UART:
+    def __init__(self, id, tx, rx, baudrate=115200):
+        self._uart = machine.UART(id, baudrate, tx=_pin(tx, machine.Pin.OUT), rx=_pin(rx, machine.Pin.IN), timeout=0)
+
+    def write(self, data):
+        return self._uart.write(data)
+
+    # Up to count bytes, or None if nothing has arrived
+    def read(self, count):
+        return self._uart.read(count)
+
+    # Number of bytes waiting
+    def any(self):
+        return self._uart.any()
+
+ticks_us = time.ticks_us
+ticks_diff = time.ticks_diff
+ticks_add = time.ticks_add
+sleep_us = time.sleep_us
@@ -0,0 +1,74 @@
+# Benchmark of GPIO toggling and scheduler loop latency, the same on every hal
+# runtime so their results compare directly. On a board, from the REPL:
+#
+#   import hal.bench
+#   hal.bench.run()
+#
+# On the desktop, against the host mock, from the repository root:
+#
+#   python -m hal.bench
+#
+# Toggle pins are driven as outputs, don't connect anything that minds.
+
+import hal
+
+# Toggles of pin in a plain loop, per second
+def raw_toggle(pin, count=10000):
+    start = hal.ticks_us()
+    for _ in range(count):
+        pin.toggle()
+    return count * 1000000 / hal.ticks_diff(hal.ticks_us(), start)
+
+def _toggler(pin, delay):
+    while True:
+        pin.toggle()
+        yield delay
+
+# Toggles of pin by a scheduler task yielding 0, per second, and scheduler
+# passes per second
+def scheduler_toggle(pin, duration_ms=1000):
+    scheduler = hal.Scheduler()
+    scheduler.add(_toggler(pin, 0))
+    toggles = pin.toggles
+    scheduler.run(duration_ms)
+    return (pin.toggles - toggles) * 1000 / duration_ms, scheduler.passes * 1000 / duration_ms
+
+# Mean and worst microseconds late of a task due every 10ms, alongside tasks
+# toggling pins every 1ms and one running whenever it can, and busy fraction
+def loop_latency(pins, duration_ms=2000):
+    scheduler = hal.Scheduler()
+    def periodic():
+        while True:
+            yield 10
+    task = scheduler.add(periodic(), "periodic")
+    for pin in pins[:-1]:
+        scheduler.add(_toggler(pin, 1))
+    scheduler.add(_toggler(pins[-1], 0))
+    scheduler.run(duration_ms)
+    return task.late_total / task.runs, task.late_max, scheduler.busy()
+
+# NeoPixel show() calls per second
+def pixel_show(pixels, count=200):
+    start = hal.ticks_us()
+    for index in range(count):
+        pixels.fill((index & 15, 0, 0))
+        pixels.show()
+    return count * 1000000 / hal.ticks_diff(hal.ticks_us(), start)
+
+# Run every benchmark and print results. Pins are GPIO numbers: toggle_pins
+# outputs to toggle, pixel_pin a NeoPixel or None to skip.
+def run(toggle_pins=(15, 16, 18, 19), pixel_pin=None):
+    pins = [hal.Pin(pin) for pin in toggle_pins]
+    print("runtime {0}".format(hal.RUNTIME))
+    print("raw_toggle {0:.0f} toggles/s".format(raw_toggle(pins[0])))
+    toggles, passes = scheduler_toggle(pins[0])
+    print("scheduler_toggle {0:.0f} toggles/s {1:.0f} passes/s".format(toggles, passes))
+    late_mean, late_max, busy = loop_latency(pins)
+    print("loop_latency mean {0:.0f} us max {1} us busy {2:.1f}%".format(late_mean, late_max, busy * 100))
+    if pixel_pin is not None:
+        print("pixel_show {0:.0f} shows/s".format(pixel_show(hal.Pixels(pixel_pin, 1))))
+    for pin in pins:
+        pin.off()
+
+if __name__ == "__main__":
+    run(pixel_pin=17)
@@ -0,0 +1,101 @@
+# Cooperative scheduler for generator tasks, on any hal runtime. A task is a
+# generator that yields the milliseconds to wait before it runs again (0 or
+# None to run again after the other tasks due):
+#
+#   def blink(led):
+#       while True:
+#           led.toggle()
+#           yield 500
+#
+# Waits are measured from when the task was due, not when it ran, so a task
+# yielding 500 runs every 500ms even if each run is a little late. A task
+# more than one wait behind starts counting again from now instead of
+# running back to back to catch up.
+#
+# For every task, how late it ran (loop latency) is recorded, and the
+# scheduler keeps count of its passes and of time spent sleeping.
+
+from hal import ticks_us, ticks_diff, ticks_add, sleep_us
+
+class Task:
+    def __init__(self, generator, name, due):
+        self.generator = generator
+        self.name = name
+        self.due = due
+        # Runs, and total and worst microseconds late
+        self.runs = 0
+        self.late_total = 0
+        self.late_max = 0
+
+class Scheduler:
+    def __init__(self):
+        self._tasks = []
+        self.passes = 0
+        # Microseconds spent sleeping while no task was due
+        self.idle_us = 0
+        self._start = ticks_us()
+
+    # Start running generator, with name for stats(). Returns its Task.
+    def add(self, generator, name=None):
+        task = Task(generator, name or "task{0}".format(len(self._tasks)), ticks_us())
+        self._tasks.append(task)
+        return task
+
+    def remove(self, task):
+        if task in self._tasks:
+            self._tasks.remove(task)
+
+    # Run tasks until all have finished, or for duration_ms if given
+    def run(self, duration_ms=None):
+        start = ticks_us()
+        end = None if duration_ms is None else ticks_add(start, duration_ms * 1000)
+        while self._tasks:
+            now = ticks_us()
+            if end is not None and ticks_diff(now, end) >= 0:
+                return
+
+            # Task due first, earliest added wins ties so yield 0 round-robins
+            task = self._tasks[0]
+            for other in self._tasks:
+                if ticks_diff(other.due, task.due) < 0:
+                    task = other
+            wait = ticks_diff(task.due, now)
+            if end is not None and wait > ticks_diff(end, now):
+                wait = ticks_diff(end, now)
+            if wait > 0:
+                sleep_us(wait)
+                self.idle_us += wait
+                continue
+
+            self.passes += 1
+            late = -wait
+            task.runs += 1
+            task.late_total += late
+            if late > task.late_max:
+                task.late_max = late
+            try:
+                delay = next(task.generator)
+            except StopIteration:
+                self._tasks.remove(task)
+                continue
+            delay_us = (delay or 0) * 1000
+            if not delay_us:
+                # Behind the others due by now
+                task.due = ticks_us()
+                self._tasks.remove(task)
+                self._tasks.append(task)
+            elif late > delay_us:
+                task.due = ticks_add(now, delay_us)
+            else:
+                task.due = ticks_add(task.due, delay_us)
+
+    # List of (name, runs, mean microseconds late, worst microseconds late)
+    # for every task still running
+    def stats(self):
+        return [(task.name, task.runs, task.late_total // task.runs if task.runs else 0, task.late_max)
+            for task in self._tasks]
+
+    # Fraction of time since created spent running tasks rather than sleeping
+    def busy(self):
+        elapsed = ticks_diff(ticks_us(), self._start)
+        return 1 - self.idle_us / elapsed if elapsed else 0.0
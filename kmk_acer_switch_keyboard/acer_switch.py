@@ -0,0 +1,144 @@
+# Scanning and keymap lookup for the Acer Aspire Switch 10 keyboard module,
+# plus a KMK module measuring key latency. Copy to the CIRCUITPY drive next to
+# code.py.
+
+import supervisor
+
+from kmk.keys import KC
+from kmk.kmk_keyboard import KMKKeyboard
+from kmk.modules import Module
+from kmk.scanners import DiodeOrientation
+from kmk.scanners.keypad import MatrixScanner
+
+# supervisor.ticks_ms() wraps around to 0 at this value
+_ticks_period = 1 << 29
+
+# Milliseconds from ticks_ms() value start to later value end
+def _ticks_diff(end, start):
+    return (end - start) % _ticks_period
+
+# Indexes of rows with a key other than KC.NO or KC.TRNS in any layer of
+# keymap, a list of layers each a flat list of rows of column_count keys. A
+# transparent key only passes on the key below, which counts if mapped.
+def populated_rows(keymap, column_count):
+    no_key = KC.NO
+    transparent = KC.TRNS
+    rows = []
+    for row in range(len(keymap[0]) // column_count):
+        for layer in keymap:
+            if any(key is not no_key and key is not transparent for key in layer[row*column_count:(row+1)*column_count]):
+                rows.append(row)
+                break
+    return rows
+
+# KMKKeyboard for a ROW2COL matrix with a sparse keymap. It scans with the
+# same keypad.KeyMatrix scanner as stock KMKKeyboard, at KMK's default scan
+# interval (and so debounce time), but rows without keys are left out. Keymap
+# lookup, which KMK does once per key event by searching coord_mapping then
+# walking active layers, is an index into a table per layer, compiled here
+# with KC.TRNS already resolved. Resolution assumes layers below the top
+# active one are active too, as they are with KC.MO layer keys.
+class AcerSwitchKeyboard(KMKKeyboard):
+    def __init__(self, row_pins, col_pins, keymap):
+        super().__init__()
+        column_count = len(col_pins)
+        rows = populated_rows(keymap, column_count)
+        self.keymap = keymap
+        self.matrix = MatrixScanner(
+            column_pins=col_pins, row_pins=[row_pins[row] for row in rows],
+            columns_to_anodes=DiodeOrientation.ROW2COL)
+
+        # Scanner key number of each keymap position, -1 in rows not scanned
+        self.coord_mapping = [-1] * len(keymap[0])
+        for key_number, row in enumerate(rows):
+            for column in range(column_count):
+                self.coord_mapping[row*column_count + column] = key_number*column_count + column
+
+        # Key for each scanner key number with each layer on top, None for none
+        no_key = KC.NO
+        transparent = KC.TRNS
+        self._layer_keys = []
+        for top in range(len(keymap)):
+            keys = [None] * (len(rows) * column_count)
+            for position, key_number in enumerate(self.coord_mapping):
+                if key_number < 0:
+                    continue
+                for layer in range(top, -1, -1):
+                    key = keymap[layer][position]
+                    if key is not transparent:
+                        break
+                if key is not no_key and key is not transparent:
+                    keys[key_number] = key
+            self._layer_keys.append(keys)
+
+    def _find_key_in_map(self, int_coord):
+        if not self.active_layers:
+            return None
+        return self._layer_keys[self.active_layers[0]][int_coord]
+
+# KMK module printing KMK main loop passes per second and key to HID report
+# latency every interval seconds. Latency is from keypad.Event timestamp (when
+# the scanner saw the change) to the end of sending the first HID report
+# after it. The matrix itself is scanned by keypad.KeyMatrix in the
+# background at its own interval, not once per loop pass.
+class ScanStats(Module):
+    def __init__(self, interval=10):
+        self._interval = int(interval * 1000)
+        self._reset(supervisor.ticks_ms())
+        # Timestamp of earliest key event not yet followed by a report
+        self._pending = None
+        self._sending = False
+
+    def _reset(self, now):
+        self._start = now
+        self._passes = 0
+        self._events = 0
+        self._reports = 0
+        self._latency_total = 0
+        self._latency_max = 0
+
+    def _print(self, now):
+        elapsed = _ticks_diff(now, self._start)
+        print("{0:.0f} loop passes/s, {1} key events, {2} reports, key to report mean {3:.1f}ms max {4}ms".format(
+            self._passes * 1000 / elapsed, self._events, self._reports,
+            self._latency_total / self._reports if self._reports else 0, self._latency_max))
+
+    def during_bootup(self, keyboard):
+        self._reset(supervisor.ticks_ms())
+
+    # Called once per KMK main loop pass
+    def before_matrix_scan(self, keyboard):
+        self._passes += 1
+        if self._interval:
+            now = supervisor.ticks_ms()
+            if _ticks_diff(now, self._start) >= self._interval:
+                self._print(now)
+                self._reset(now)
+
+    def after_matrix_scan(self, keyboard):
+        event = keyboard.matrix_update
+        if event:
+            self._events += 1
+            if self._pending is None:
+                self._pending = event.timestamp
+
+    def process_key(self, keyboard, key, is_pressed, int_coord):
+        return key
+
+    def before_hid_send(self, keyboard):
+        self._sending = keyboard.hid_pending
+
+    def after_hid_send(self, keyboard):
+        if self._sending and self._pending is not None:
+            latency = _ticks_diff(supervisor.ticks_ms(), self._pending)
+            self._reports += 1
+            self._latency_total += latency
+            if latency > self._latency_max:
+                self._latency_max = latency
+            self._pending = None
+
+    def on_powersave_enable(self, keyboard):
+        pass
+
+    def on_powersave_disable(self, keyboard):
+        pass
@@ -4,15 +4,27 @@ import board
 
 from kmk.kmk_keyboard import KMKKeyboard
 from kmk.keys import KC
+from kmk.modules.layers import Layers
 from kmk.scanners import DiodeOrientation
 
-keyboard = KMKKeyboard()
+import acer_switch
 
-keyboard.col_pins = (board.GP12,board.GP13,board.GP14,board.GP15,board.GP16,board.GP17,board.GP18,board.GP19)
-keyboard.row_pins = (board.GP1,board.GP2,board.GP3,board.GP4,board.GP5,board.GP6,board.GP7,board.GP8,board.GP9,board.GP10,board.GP11,board.GP20,board.GP21,board.GP22,board.A0,board.A1)
-keyboard.diode_orientation = DiodeOrientation.ROW2COL
+# Leave rows without keys out of the scan and look keys up in tables compiled
+# from the keymap (see acer_switch.py). Both use KMK's keypad.KeyMatrix scanner
+# at its default interval. Set to False for stock KMKKeyboard, e.g. to compare
+# what ScanStats prints.
+optimized = True
 
-keyboard.keymap = [
+# Print KMK main loop passes per second and key to HID report latency every
+# this many seconds over the serial console. 0 to not measure.
+stats_interval = 10
+
+col_pins = (board.GP12,board.GP13,board.GP14,board.GP15,board.GP16,board.GP17,board.GP18,board.GP19)
+row_pins = (board.GP1,board.GP2,board.GP3,board.GP4,board.GP5,board.GP6,board.GP7,board.GP8,board.GP9,board.GP10,board.GP11,board.GP20,board.GP21,board.GP22,board.A0,board.A1)
+
+FN = KC.MO(1)
+
+keymap = [
     #12         13          14          15          16          17          18          19          Keyboard pins
     [KC.NO,     KC.UP,      KC.NO,      KC.NO,      KC.NO,      KC.DOWN,    KC.ESCAPE,  KC.NO,      # 1
      KC.BSPACE, KC.DELETE,  KC.RBRACKET,KC.QUOTE,   KC.NO,      KC.NO,      KC.NO,      KC.ENTER,   # 2
@@ -29,10 +41,37 @@ keyboard.keymap = [
      KC.NO,     KC.LCTRL,   KC.NO,      KC.N0,      KC.NO,      KC.NO,      KC.NO,      KC.NO,      # 21
      KC.LWIN,   KC.NO,      KC.NO,      KC.P,       KC.NO,      KC.NO,      KC.NO,      KC.NO,      # 22
      KC.NO,     KC.NO,      KC.NO,      KC.SCOLON,  KC.RALT,    KC.NO,      KC.LALT,    KC.NO,      # 23
-     KC.GRAVE,  KC.NO,      KC.TAB,     KC.CAPSLOCK,KC.WINMENU, KC.NO,      KC.NO,      KC.NO,      # 24
-     #                                       Special handling required for 19+24 = "Fn" ^^^^^
+     KC.GRAVE,  KC.NO,      KC.TAB,     KC.CAPSLOCK,KC.WINMENU, KC.NO,      KC.NO,      FN,         # 24
      ]
 ]
 
+# Fn layer, as (key, key with Fn held) pairs. Everything else is transparent.
+fn_keys = (
+    (KC.UP, KC.PGUP),
+    (KC.DOWN, KC.PGDOWN),
+    (KC.LEFT, KC.HOME),
+    (KC.RIGHT, KC.END),
+    (KC.PGUP, KC.HOME),
+    (KC.PGDOWN, KC.END),
+    (KC.PSCREEN, KC.SLCK),
+)
+fn_layer = [KC.TRNS] * len(keymap[0])
+for key, fn_key in fn_keys:
+    fn_layer[keymap[0].index(key)] = fn_key
+keymap.append(fn_layer)
+
+if optimized:
+    keyboard = acer_switch.AcerSwitchKeyboard(row_pins, col_pins, keymap)
+else:
+    keyboard = KMKKeyboard()
+    keyboard.col_pins = col_pins
+    keyboard.row_pins = row_pins
+    keyboard.diode_orientation = DiodeOrientation.ROW2COL
+    keyboard.keymap = keymap
+
+keyboard.modules.append(Layers())
+if stats_interval:
+    keyboard.modules.append(acer_switch.ScanStats(stats_interval))
+
 if __name__ == '__main__':
     keyboard.go()